@@ -7,15 +7,43 @@ from tqdm import tqdm
 import re
 import hashlib
 import json
-from typing import Set, List, Dict, Tuple
+from typing import Set, List, Dict, Tuple, Optional
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 import time
 from colorama import init, Fore, Back, Style
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
+import copy
+import gzip
+import shutil
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import zipfile
+import mmap
+import csv
+import io
+import base64
+import threading
+import socket
+import html
+import argparse
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urljoin, urlsplit
 from datetime import datetime
+from email.parser import BytesHeaderParser
 from importlib.metadata import version, PackageNotFoundError
 import pkg_resources
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # Inicializa o colorama
 init(autoreset=True)
@@ -34,36 +62,173 @@ def get_version(package_name: str) -> str:
     except PackageNotFoundError:
         return None
 
+def _travar_arquivo(f, travar: bool):
+    """Obtém (ou libera) o lock exclusivo de um arquivo aberto: flock no POSIX, msvcrt no Windows."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if travar else fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    if not travar:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # tenta por ~10 s antes de desistir
+            return
+        except OSError:
+            continue
+
 # Configuração do sistema de log
+LOG_ARQUIVO = "hermes_installer.jsonl"  # compartilhado por todos os processos (ver RotatingGzipHandler)
+LOG_TAMANHO_MAXIMO = 5 * 1024 * 1024  # 5 MB por arquivo antes de rotacionar
+LOG_BACKUPS = 5  # quantidade de arquivos rotacionados (.gz) mantidos
+LOG_IDADE_MAXIMA_DIAS = 14  # arquivos de log mais antigos são removidos
+
+# Campos estruturados aceitos pelos helpers de log (via extra=)
+CAMPOS_LOG = ("pacote", "fase", "duracao")
+
+class FormatadorJson(logging.Formatter):
+    """Formata cada registro de log como uma linha JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for campo in CAMPOS_LOG:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = valor
+        if record.exc_info:
+            registro["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            registro["exc"] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False)
+
+class FilaLogHandler(QueueHandler):
+    """QueueHandler que preserva o traceback em exc_text em vez de incorporá-lo à mensagem.
+
+    O prepare() padrão formata o registro inteiro em msg e descarta exc_info,
+    o que impediria o FormatadorJson de gravar o campo "exc".
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+class RotatingGzipHandler(logging.Handler):
+    """Grava o log em um arquivo compartilhado entre processos, rotacionado por tamanho com gzip.
+
+    Cada registro é gravado sob um lock de arquivo (<log>.lock), com o arquivo de log
+    aberto apenas durante a escrita: processos simultâneos (ex.: serve e install)
+    nunca disputam a rotação, e no Windows o arquivo pode ser renomeado.
+    """
+
+    def __init__(self, arquivo: Path, maxBytes: int, backupCount: int, encoding: str = 'utf-8'):
+        super().__init__()
+        self.arquivo = str(arquivo)
+        self.max_bytes = maxBytes
+        self.backups = backupCount
+        self.encoding = encoding
+        self._trava_arquivo = open(self.arquivo + ".lock", 'a+b')
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            linha = (self.format(record) + "\n").encode(self.encoding)
+            _travar_arquivo(self._trava_arquivo, True)
+            try:
+                try:
+                    tamanho = os.path.getsize(self.arquivo)
+                except OSError:
+                    tamanho = 0
+                if tamanho and tamanho + len(linha) > self.max_bytes:
+                    self._rotacionar()
+                with open(self.arquivo, 'ab') as f:
+                    f.write(linha)
+            finally:
+                _travar_arquivo(self._trava_arquivo, False)
+        except Exception:
+            self.handleError(record)
+
+    def _rotacionar(self):
+        """Desloca os backups (.1.gz -> .2.gz...) e comprime o arquivo atual em .1.gz."""
+        for indice in range(self.backups - 1, 0, -1):
+            origem = f"{self.arquivo}.{indice}.gz"
+            if os.path.exists(origem):
+                os.replace(origem, f"{self.arquivo}.{indice + 1}.gz")
+        if self.backups > 0:
+            with open(self.arquivo, 'rb') as f_in, gzip.open(f"{self.arquivo}.1.gz", 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        os.remove(self.arquivo)
+
+    def close(self):
+        self._trava_arquivo.close()
+        super().close()
+
+def limpar_logs_antigos(log_dir: Path, dias: int = LOG_IDADE_MAXIMA_DIAS):
+    """Remove arquivos de log mais antigos que o limite de idade."""
+    limite = time.time() - dias * 86400
+    for arquivo in log_dir.glob("hermes_installer*"):
+        if arquivo.suffix == ".lock":
+            continue  # pode estar em uso por outro processo
+        try:
+            if arquivo.is_file() and arquivo.stat().st_mtime < limite:
+                arquivo.unlink()
+        except OSError:
+            continue
+
 def setup_logger():
-    """Configura o sistema de log."""
+    """Configura o sistema de log.
+
+    Os registros são enfileirados e gravados em disco por uma thread em segundo
+    plano (QueueListener), em formato JSON lines, em um único arquivo compartilhado
+    pelos processos, com rotação por tamanho e limpeza por idade. O console recebe
+    apenas erros, sem passar pela fila.
+    """
     script_dir = get_script_dir()
     log_dir = script_dir / "logs"
     log_dir.mkdir(exist_ok=True)
+    limpar_logs_antigos(log_dir)
     
-    # Nome do arquivo de log com timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = log_dir / f"hermes_installer_{timestamp}.log"
+    log_file = log_dir / LOG_ARQUIVO
     
     # Configuração do logger
     logger = logging.getLogger("HermesInstaller")
     logger.setLevel(logging.DEBUG)
+    logger.propagate = False
     
-    # Handler para arquivo (nível DEBUG - todos os logs)
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    # Handler para arquivo (nível DEBUG - todos os logs), executado pela thread do listener
+    file_handler = RotatingGzipHandler(
+        log_file,
+        maxBytes=LOG_TAMANHO_MAXIMO,
+        backupCount=LOG_BACKUPS,
+        encoding='utf-8',
+    )
     file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(FormatadorJson())
+    
+    # Fila sem limite: o produtor nunca bloqueia esperando o disco
+    fila_log = queue.SimpleQueue()
+    queue_handler = FilaLogHandler(fila_log)
+    queue_handler.setLevel(logging.DEBUG)
+    listener = QueueListener(fila_log, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
     
     # Handler para console (apenas erros críticos)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.ERROR)
-    
-    # Formato do log
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     
     # Adiciona os handlers ao logger
-    logger.addHandler(file_handler)
+    logger.addHandler(queue_handler)
     logger.addHandler(console_handler)
     
     return logger
@@ -71,30 +236,34 @@ def setup_logger():
 # Inicializa o logger
 logger = setup_logger()
 
-def print_success(text: str):
+def _extra_log(campos: dict) -> dict:
+    """Filtra os campos estruturados para o parâmetro extra= do logging."""
+    return {campo: valor for campo, valor in campos.items() if campo in CAMPOS_LOG and valor is not None}
+
+def print_success(text: str, **campos):
     """Imprime texto em verde e registra no log."""
     print(f"{Fore.GREEN}{text}")
-    logger.debug(text)  # Mudado para debug
+    logger.debug(text, extra=_extra_log(campos))  # Mudado para debug
 
-def print_error(text: str):
+def print_error(text: str, **campos):
     """Imprime texto em vermelho e registra no log."""
     print(f"{Fore.RED}{text}")
-    logger.error(text)
+    logger.error(text, extra=_extra_log(campos))
 
-def print_warning(text: str):
+def print_warning(text: str, **campos):
     """Imprime texto em amarelo e registra no log."""
     print(f"{Fore.YELLOW}{text}")
-    logger.debug(text)  # Mudado para debug
+    logger.debug(text, extra=_extra_log(campos))  # Mudado para debug
 
-def print_info(text: str):
+def print_info(text: str, **campos):
     """Imprime texto em azul e registra no log."""
     print(f"{Fore.BLUE}{text}")
-    logger.debug(text)  # Mudado para debug
+    logger.debug(text, extra=_extra_log(campos))  # Mudado para debug
 
-def print_highlight(text: str):
+def print_highlight(text: str, **campos):
     """Imprime texto em magenta e registra no log."""
     print(f"{Fore.MAGENTA}{text}")
-    logger.debug(text)  # Mudado para debug
+    logger.debug(text, extra=_extra_log(campos))  # Mudado para debug
 
 def log_exception(e: Exception, context: str = ""):
     """Registra uma exceção no log com contexto."""
@@ -102,6 +271,16 @@ def log_exception(e: Exception, context: str = ""):
     logger.exception(error_msg)
     print_error(error_msg)
 
+@contextmanager
+def medir_fase(fase: str, pacote: str = None):
+    """Registra no log a duração de uma fase (download, instalação...) de um pacote."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = round(time.perf_counter() - inicio, 3)
+        logger.debug(f"Fase {fase} finalizada", extra=_extra_log({"pacote": pacote, "fase": fase, "duracao": duracao}))
+
 def exibir_logo():
     """Exibe o logo do Hermes Installer."""
     logo = f"""
@@ -128,15 +307,118 @@ def confirmar_inicio():
     resposta = input().strip().upper()
     return resposta == 'S'
 
+# Acesso à rede: modo offline, sonda de conectividade e disjuntor por host
+SONDA_HOST = "pypi.org"
+SONDA_TIMEOUT = 0.8  # segundos; a sonda nunca atrasa a inicialização mais que isso
+DISJUNTOR_TEMPO_ABERTO = 60  # segundos que um host fica bloqueado após uma falha de conexão
+TIMEOUT_PADRAO = (3.05, 30)  # (conexão, leitura) para requisições sem timeout explícito
+VARIAVEL_OFFLINE = "HERMES_OFFLINE"
+
+class ErroRedeIndisponivel(requests.exceptions.ConnectionError):
+    """Requisição bloqueada pelo modo offline ou pelo disjuntor aberto do host."""
+
+class DisjuntorRede:
+    """Controla o acesso à rede: modo offline explícito e disjuntor por host.
+
+    Após a primeira falha de conexão (ou timeout) com um host, novas requisições
+    a ele falham imediatamente até DISJUNTOR_TEMPO_ABERTO segundos depois.
+    """
+
+    def __init__(self, tempo_aberto: float = DISJUNTOR_TEMPO_ABERTO):
+        self.offline = os.environ.get(VARIAVEL_OFFLINE, "").lower() in ("1", "true", "sim", "s")
+        self.tempo_aberto = tempo_aberto
+        self._abertos: Dict[str, float] = {}
+        self._trava = threading.Lock()
+
+    def disponivel(self, host: str = SONDA_HOST) -> bool:
+        """Indica se requisições ao host podem ser feitas agora."""
+        if self.offline:
+            return False
+        with self._trava:
+            return self._abertos.get(host, 0) <= time.monotonic()
+
+    def verificar(self, url: str):
+        """Levanta ErroRedeIndisponivel se a requisição à URL não deve ser feita."""
+        host = urlsplit(url).hostname or ""
+        if self.offline:
+            raise ErroRedeIndisponivel(f"Modo offline: acesso a {host} bloqueado")
+        if not self.disponivel(host):
+            raise ErroRedeIndisponivel(f"Host {host} indisponível (disjuntor aberto)")
+
+    def registrar_falha(self, url: str, erro: Exception):
+        host = urlsplit(url).hostname or ""
+        with self._trava:
+            ja_aberto = self._abertos.get(host, 0) > time.monotonic()
+            self._abertos[host] = time.monotonic() + self.tempo_aberto
+        if not ja_aberto:
+            logger.debug(f"Disjuntor aberto para {host} por {self.tempo_aberto}s: {erro}", extra={"fase": "rede"})
+
+    def registrar_sucesso(self, url: str):
+        host = urlsplit(url).hostname or ""
+        with self._trava:
+            self._abertos.pop(host, None)
+
+    def sondar(self, host: str = SONDA_HOST, porta: int = 443, timeout: float = SONDA_TIMEOUT) -> bool:
+        """Testa a conectividade (DNS + TCP) em menos de `timeout` segundos.
+
+        A sonda roda em uma thread para que nem a resolução DNS ultrapasse o limite.
+        Se houver proxy HTTPS configurado, é ele que é testado.
+        """
+        proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
+        if proxy:
+            partes = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            host, porta = partes.hostname, partes.port or 80
+        resultado = []
+        
+        def conectar():
+            try:
+                socket.create_connection((host, porta), timeout=timeout).close()
+                resultado.append(True)
+            except OSError as e:
+                logger.debug(f"Sonda de conectividade falhou para {host}:{porta}: {e}", extra={"fase": "rede"})
+        
+        inicio = time.perf_counter()
+        sonda = threading.Thread(target=conectar, daemon=True)
+        sonda.start()
+        sonda.join(timeout)
+        conectado = bool(resultado)
+        logger.debug(f"Sonda de conectividade: {'ok' if conectado else 'sem conexão'}",
+                     extra={"fase": "rede", "duracao": round(time.perf_counter() - inicio, 3)})
+        return conectado
+
+# Estado de rede compartilhado por todas as sessões
+disjuntor = DisjuntorRede()
+
+class AdaptadorDisjuntor(HTTPAdapter):
+    """HTTPAdapter que respeita o modo offline/disjuntor e aplica um timeout padrão."""
+
+    def send(self, request, **kwargs):
+        disjuntor.verificar(request.url)
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = TIMEOUT_PADRAO
+        try:
+            resposta = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            disjuntor.registrar_falha(request.url, e)
+            raise
+        disjuntor.registrar_sucesso(request.url)
+        return resposta
+
 def criar_sessao_requests():
-    """Cria uma sessão do requests com retry automático."""
+    """Cria uma sessão do requests com retry automático.
+
+    Erros de conexão e timeouts de leitura não são repetidos: a primeira falha
+    abre o disjuntor do host. Apenas respostas 5xx são tentadas novamente.
+    """
     session = requests.Session()
     retry = Retry(
         total=3,
+        connect=0,
+        read=0,
         backoff_factor=0.5,
         status_forcelist=[500, 502, 503, 504]
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = AdaptadorDisjuntor(max_retries=retry)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
@@ -180,6 +462,50 @@ def extrair_nome_versao(requisito: str) -> Tuple[str, str]:
     # Se não encontrar padrão de versão, retorna o nome e None
     return requisito.strip(), None
 
+@lru_cache(maxsize=None)
+def obter_json_pypi(nome_pacote: str, versao: str) -> Dict:
+    """Obtém (uma única vez por execução) os metadados JSON de uma versão no PyPI."""
+    session = criar_sessao_requests()
+    url = f"https://pypi.org/pypi/{nome_pacote}/{versao}/json"
+    response = session.get(url, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+@lru_cache(maxsize=None)
+def obter_versoes_pypi(nome_pacote: str) -> Tuple[str, ...]:
+    """Obtém (uma única vez por execução) as versões publicadas de um projeto no PyPI, exceto as retiradas (yanked)."""
+    session = criar_sessao_requests()
+    url = f"https://pypi.org/pypi/{nome_pacote}/json"
+    response = session.get(url, timeout=10)
+    response.raise_for_status()
+    return tuple(
+        versao for versao, arquivos in response.json().get("releases", {}).items()
+        if arquivos and not all(arquivo.get("yanked") for arquivo in arquivos)
+    )
+
+def limpar_requires_dist(requires_dist: List[str]) -> List[str]:
+    """Converte entradas Requires-Dist em requisitos simples (sem extras nem marcadores).
+
+    Dependências exclusivas de extras e marcadores falsos para o ambiente atual são descartadas.
+    """
+    dependencias = []
+    for req in requires_dist:
+        if ';' in req:
+            marcador = req.split(';', 1)[1]
+            if 'extra' in marcador:
+                continue
+            try:
+                requisito = pkg_resources.Requirement.parse(req)
+                if requisito.marker is not None and not requisito.marker.evaluate():
+                    continue
+            except Exception:
+                pass  # marcador não reconhecido: mantém a dependência
+        # Remove especificações de versão extras e marcadores de ambiente
+        req = req.split(';')[0].split('[')[0].strip()
+        if req and not req.startswith('python'):
+            dependencias.append(req)
+    return dependencias
+
 def obter_dependencias_pypi(nome_pacote: str, versao: str) -> List[str]:
     """Obtém as dependências de um pacote do PyPI."""
     try:
@@ -191,22 +517,13 @@ def obter_dependencias_pypi(nome_pacote: str, versao: str) -> List[str]:
         if not versao or not re.match(r'^\d+(\.\d+)*$', versao):
             print_warning(f"Versão inválida para {nome_pacote}: {versao}")
             return []
-            
-        session = criar_sessao_requests()
-        url = f"https://pypi.org/pypi/{nome_pacote}/{versao}/json"
-        response = session.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        dependencias = []
-        if 'info' in data and 'requires_dist' in data['info'] and data['info']['requires_dist']:
-            for req in data['info']['requires_dist']:
-                # Remove especificações de versão extras e marcadores de ambiente
-                req = req.split(';')[0].split('[')[0].strip()
-                if req and not req.startswith('python'):
-                    dependencias.append(req)
         
-        return dependencias
+        if not disjuntor.disponivel("pypi.org"):
+            logger.debug(f"PyPI indisponível, dependências de {nome_pacote} não consultadas")
+            return []
+            
+        data = obter_json_pypi(nome_pacote, versao)
+        return limpar_requires_dist(data.get('info', {}).get('requires_dist') or [])
     except requests.exceptions.RequestException as e:
         print_error(f"Erro ao obter dependências de {nome_pacote}: {e}")
         return []
@@ -214,6 +531,14 @@ def obter_dependencias_pypi(nome_pacote: str, versao: str) -> List[str]:
         print_error(f"Erro inesperado ao obter dependências de {nome_pacote}: {e}")
         return []
 
+def obter_dependencias(nome_pacote: str, versao: str, pasta_requirements: Path = None) -> List[str]:
+    """Obtém as dependências de um pacote, preferindo o METADATA do wheel local ao PyPI."""
+    if pasta_requirements is not None:
+        dependencias = obter_dependencias_locais(pasta_requirements, nome_pacote, versao)
+        if dependencias is not None:
+            return dependencias
+    return obter_dependencias_pypi(nome_pacote, versao)
+
 def processar_dependencias_recursivamente(pacotes_iniciais: List[str]) -> Set[str]:
     """Processa dependências recursivamente."""
     pacotes_processados = set()
@@ -275,7 +600,7 @@ def verificar_pacotes_requirements(pasta_requirements, pacotes):
         try:
             # Tenta obter o hash do arquivo no PyPI
             url, _ = obter_url_pacote(nome_pacote, versao)
-            response = requests.head(url)
+            response = criar_sessao_requests().head(url)
             tamanho_esperado = int(response.headers.get('content-length', 0))
             
             # Verifica o tamanho do arquivo local
@@ -284,6 +609,9 @@ def verificar_pacotes_requirements(pasta_requirements, pacotes):
             if tamanho_local != tamanho_esperado:
                 pacotes_desatualizados.append(pacote)
                 arquivo.unlink()  # Remove o arquivo corrompido
+        except ErroRedeIndisponivel:
+            # Sem rede não é possível verificar: o arquivo local é mantido
+            continue
         except Exception:
             pacotes_desatualizados.append(pacote)
             if arquivo.exists():
@@ -309,88 +637,191 @@ def obter_url_pacote(nome_pacote, versao):
     # Se não encontrar o wheel, tenta o tar.gz
     url_tar = f"https://files.pythonhosted.org/packages/source/{nome_pacote[0]}/{nome_pacote}/{nome_pacote}-{versao}.tar.gz"
     
+    session = criar_sessao_requests()
+    
     # Tenta primeiro o wheel
-    response = requests.head(url_wheel)
+    response = session.head(url_wheel)
     if response.status_code == 200:
         return url_wheel, ".whl"
     
     # Se não encontrar o wheel, tenta o tar.gz
-    response = requests.head(url_tar)
+    response = session.head(url_tar)
     if response.status_code == 200:
         return url_tar, ".tar.gz"
     
     # Se não encontrar nenhum dos dois, tenta buscar na página do pacote
     url_pypi = f"https://pypi.org/pypi/{nome_pacote}/{versao}/json"
-    response = requests.get(url_pypi)
+    response = session.get(url_pypi)
     if response.status_code == 200:
         data = response.json()
         if 'urls' in data:
             for url_info in data['urls']:
                 if url_info['packagetype'] in ['wheel', 'sdist']:
-                    return url_info['url'], os.path.splitext(url_info['filename'])[1]
+                    return url_info['url'], extensao_artefato(url_info['filename']) or os.path.splitext(url_info['filename'])[1]
     
     raise Exception(f"Não foi possível encontrar o pacote {nome_pacote} versão {versao}")
 
-def baixar_pacote(pacote: str, pasta_destino: Path) -> bool:
-    """Baixa um pacote do PyPI para a pasta requirements."""
+# Gravação de downloads: buffers reutilizáveis de tamanho adaptativo
+BUFFER_MINIMO = 64 * 1024
+BUFFER_MAXIMO = 4 * 1024 * 1024
+LEITURA_RAPIDA = 0.05  # s; leituras que enchem o buffer mais rápido que isso dobram seu tamanho
+LEITURA_LENTA = 0.5  # s; leituras mais lentas que isso reduzem o buffer pela metade
+PROGRESSO_INTERVALO = 0.1  # s entre atualizações da barra de progresso
+
+# Cada thread de download reutiliza o mesmo buffer pré-alocado
+_buffers_download = threading.local()
+
+def _buffer_download() -> memoryview:
+    buffer = getattr(_buffers_download, "buffer", None)
+    if buffer is None:
+        buffer = _buffers_download.buffer = memoryview(bytearray(BUFFER_MAXIMO))
+    return buffer
+
+def gravar_stream(response: requests.Response, arquivo_destino: Path, descricao: str = None,
+                  hasher=None, mostrar_progresso: bool = True) -> int:
+    """Grava o corpo de uma resposta (stream=True) em arquivo e retorna o número de bytes gravados.
+
+    Os dados são lidos com readinto em um buffer pré-alocado (via memoryview), cujo
+    tamanho se adapta à vazão observada. Com o tamanho conhecido, o arquivo é
+    pré-alocado; a barra de progresso é atualizada no máximo a cada PROGRESSO_INTERVALO.
+    Como a pré-alocação preenche o arquivo com zeros, o destino deve ser um arquivo
+    temporário (.part), renomeado pelo chamador apenas após o retorno.
+    """
+    bruto = response.raw
+    bruto.decode_content = True
+    codificado = bool(response.headers.get('content-encoding'))
+    # Com Content-Encoding, o content-length é do corpo comprimido e não do arquivo final
+    total = 0 if codificado else int(response.headers.get('content-length', 0))
+    buffer = _buffer_download()
+    tamanho_leitura = BUFFER_MINIMO
+    escritos = 0
+    pendente_progresso = 0
+    
+    with open(arquivo_destino, 'wb') as f, tqdm(
+        desc=descricao or arquivo_destino.name,
+        total=total,
+        unit='iB',
+        unit_scale=True,
+        unit_divisor=1024,
+        disable=not mostrar_progresso,
+    ) as barra:
+        if total:
+            try:
+                os.posix_fallocate(f.fileno(), 0, total)
+            except (AttributeError, OSError):
+                pass  # sem posix_fallocate (ex.: Windows) ou não suportado pelo sistema de arquivos
+        ultimo_progresso = time.monotonic()
+        while True:
+            janela = buffer[:tamanho_leitura]
+            inicio = time.monotonic()
+            try:
+                lidos = bruto.readinto(janela)
+            except Urllib3HTTPError as e:
+                raise requests.exceptions.ConnectionError(e)
+            if not lidos:
+                break
+            agora = time.monotonic()
+            f.write(janela[:lidos])
+            if hasher is not None:
+                hasher.update(janela[:lidos])
+            escritos += lidos
+            
+            # Ajusta o buffer pela vazão: menos iterações em conexões rápidas, menos latência nas lentas
+            if lidos == tamanho_leitura and agora - inicio < LEITURA_RAPIDA:
+                tamanho_leitura = min(tamanho_leitura * 2, BUFFER_MAXIMO)
+            elif agora - inicio > LEITURA_LENTA:
+                tamanho_leitura = max(tamanho_leitura // 2, BUFFER_MINIMO)
+            
+            pendente_progresso += lidos
+            if agora - ultimo_progresso >= PROGRESSO_INTERVALO:
+                barra.update(pendente_progresso)
+                pendente_progresso = 0
+                ultimo_progresso = agora
+        barra.update(pendente_progresso)
+        if total and escritos != total:
+            raise requests.exceptions.ConnectionError(
+                f"Download incompleto de {arquivo_destino.name}: {escritos} de {total} bytes"
+            )
+    return escritos
+
+def baixar_pacote(pacote: str, pasta_destino: Path) -> Optional[Path]:
+    """Baixa um pacote do PyPI para a pasta requirements.
+
+    Retorna o caminho do arquivo baixado (ou já existente) ou None em caso de falha.
+    """
     nome_pacote, versao = extrair_nome_versao(pacote)
     if not versao:
         print_warning(f"Pacote {pacote} não tem versão especificada, pulando...")
-        return False
+        return None
+    
+    # Offline-first: se o pacote já está na pasta, a rede não é consultada
+    arquivos_locais = localizar_artefatos(pasta_destino, pacote)
+    if arquivos_locais:
+        print_info(f"Pacote {nome_pacote} já existe em requirements/")
+        registrar_uso(pasta_destino, arquivos_locais)
+        return min(arquivos_locais, key=lambda arquivo: (not arquivo.name.endswith('.whl'), arquivo.name))
+    if not disjuntor.disponivel():
+        print_error(f"Pacote {nome_pacote} não encontrado em requirements/ (sem acesso ao PyPI)", pacote=nome_pacote, fase="download")
+        return None
     
+    parcial = None
     try:
         # Obtém a URL correta do pacote
         url, extensao = obter_url_pacote(nome_pacote, versao)
         
-        # Nome do arquivo de destino
-        arquivo_destino = pasta_destino / f"{nome_pacote}-{versao}{extensao}"
+        # Nome do arquivo de destino: o mesmo do índice, pois o pip recusa wheels sem as tags no nome
+        nome_arquivo = unquote(urlsplit(url).path.rsplit('/', 1)[-1])
+        if ("/" in nome_arquivo or "\\" in nome_arquivo or not nome_arquivo.endswith(extensao)
+                or (nome_projeto_artefato(nome_arquivo), versao_artefato(nome_arquivo)) != (normalizar_nome(nome_pacote), versao)):
+            nome_arquivo = f"{nome_pacote}-{versao}{extensao}"
+        arquivo_destino = pasta_destino / nome_arquivo
         
         if arquivo_destino.exists():
             print_info(f"Pacote {nome_pacote} já existe em requirements/")
-            return True
+            registrar_uso(pasta_destino, [arquivo_destino])
+            return arquivo_destino
         
-        print_info(f"Baixando {nome_pacote}...")
-        session = criar_sessao_requests()
-        response = session.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        # Obtém o tamanho total do arquivo
-        total_size = int(response.headers.get('content-length', 0))
-        
-        # Baixa o arquivo com barra de progresso
-        with open(arquivo_destino, 'wb') as f, tqdm(
-            desc=nome_pacote,
-            total=total_size,
-            unit='iB',
-            unit_scale=True,
-            unit_divisor=1024,
-        ) as barra:
-            for data in response.iter_content(chunk_size=1024):
-                tamanho = f.write(data)
-                barra.update(tamanho)
+        print_info(f"Baixando {nome_pacote}...", pacote=nome_pacote, fase="download")
+        with medir_fase("download", nome_pacote):
+            session = criar_sessao_requests()
+            with session.get(url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                
+                # Baixa para um arquivo temporário, renomeado apenas após a gravação completa
+                parcial = arquivo_destino.with_name(arquivo_destino.name + ".part")
+                gravar_stream(response, parcial, nome_pacote)
+        os.replace(parcial, arquivo_destino)
         
-        print_success(f"Pacote {nome_pacote} baixado com sucesso!")
-        return True
+        try:
+            registrar_artefato(pasta_destino, arquivo_destino)
+        except OSError as e:
+            # O download está completo; o manifesto é sincronizado na próxima leitura
+            logger.error(f"Erro ao registrar {arquivo_destino.name} no manifesto: {e}")
+        print_success(f"Pacote {nome_pacote} baixado com sucesso!", pacote=nome_pacote, fase="download")
+        return arquivo_destino
     except requests.exceptions.RequestException as e:
-        print_error(f"Erro ao baixar {nome_pacote}: {e}")
-        if arquivo_destino.exists():
-            arquivo_destino.unlink()
-        return False
+        print_error(f"Erro ao baixar {nome_pacote}: {e}", pacote=nome_pacote, fase="download")
+        return None
     except Exception as e:
-        print_error(f"Erro inesperado ao baixar {nome_pacote}: {e}")
-        if arquivo_destino.exists():
-            arquivo_destino.unlink()
-        return False
+        print_error(f"Erro inesperado ao baixar {nome_pacote}: {e}", pacote=nome_pacote, fase="download")
+        return None
+    finally:
+        # Também em KeyboardInterrupt: um download incompleto nunca fica na pasta
+        if parcial is not None and parcial.exists():
+            parcial.unlink()
 
-def criar_ambiente_virtual():
-    """Cria um ambiente virtual Python se não existir."""
-    script_dir = get_script_dir()
-    venv_path = script_dir / "venv"
+def criar_ambiente_virtual(venv_path: Path = None, interpretador: str = None):
+    """Cria um ambiente virtual Python se não existir.
+
+    Por padrão cria ./venv com o interpretador atual.
+    """
+    venv_path = venv_path or get_script_dir() / "venv"
+    interpretador = interpretador or sys.executable
     
     try:
         if not venv_path.exists():
-            print_info("Criando ambiente virtual...")
-            subprocess.run([sys.executable, "-m", "venv", str(venv_path)], check=True)
+            print_info(f"Criando ambiente virtual ({venv_path.name})...")
+            subprocess.run([interpretador, "-m", "venv", str(venv_path)], check=True)
             
             # Aguarda um momento para garantir que os arquivos sejam criados
             time.sleep(2)
@@ -406,11 +837,11 @@ def criar_ambiente_virtual():
             if not python_path.exists() or not pip_path.exists():
                 raise FileNotFoundError("Arquivos do ambiente virtual não foram criados corretamente")
             
-            print_success("Ambiente virtual criado com sucesso!")
-            logger.debug("Ambiente virtual criado com sucesso")
+            print_success(f"Ambiente virtual ({venv_path.name}) criado com sucesso!")
+            logger.debug(f"Ambiente virtual criado com sucesso em {venv_path}")
             return True
         else:
-            logger.debug("Ambiente virtual já existe")
+            logger.debug(f"Ambiente virtual já existe em {venv_path}")
             return True
             
     except subprocess.CalledProcessError as e:
@@ -420,10 +851,9 @@ def criar_ambiente_virtual():
         log_exception(e, "Erro inesperado ao criar ambiente virtual")
         return False
 
-def ativar_ambiente_virtual():
-    """Ativa o ambiente virtual."""
-    script_dir = get_script_dir()
-    venv_path = script_dir / "venv"
+def ativar_ambiente_virtual(venv_path: Path = None):
+    """Ativa o ambiente virtual (por padrão ./venv)."""
+    venv_path = venv_path or get_script_dir() / "venv"
     
     if not venv_path.exists():
         raise FileNotFoundError("Ambiente virtual não encontrado!")
@@ -446,6 +876,43 @@ def ativar_ambiente_virtual():
 
     return str(python_path), str(pip_path)
 
+def atualizar_pip(pip_path: str, pasta_requirements: Path) -> bool:
+    """Atualiza o pip do ambiente virtual, com fallback para a versão local em requirements/."""
+    print_info("Atualizando pip...")
+    if disjuntor.disponivel("pypi.org"):
+        try:
+            subprocess.run([pip_path, "install", "--upgrade", "pip"], check=True)
+            logger.debug("Pip atualizado com sucesso")
+            return True
+        except Exception as e:
+            log_exception(e, "Erro ao atualizar pip pela internet")
+        print_warning("Não foi possível atualizar o pip pela internet. Tentando instalar versão local do pip...")
+    else:
+        print_info("Sem acesso ao PyPI, usando versão local do pip...")
+    
+    # Tentar instalar pip localmente
+    pip_local = None
+    if pasta_requirements.exists():
+        for arquivo in pasta_requirements.iterdir():
+            if arquivo.name.startswith("pip-") and eh_artefato(arquivo):
+                pip_local = str(arquivo)
+                break
+    if pip_local:
+        try:
+            subprocess.run([pip_path, "install", "--no-index", "--upgrade", pip_local], check=True)
+            print_success("Pip instalado/atualizado localmente com sucesso!")
+            logger.debug("Pip instalado/atualizado localmente com sucesso")
+            return True
+        except Exception as e2:
+            log_exception(e2, "Falha ao instalar pip localmente")
+            print_error("Falha ao instalar o pip localmente. Verifique sua conexão ou o arquivo local.")
+            return False
+    if not disjuntor.disponivel():
+        print_warning("Arquivo do pip não encontrado na pasta requirements. Mantendo o pip do ambiente virtual.")
+        return True
+    print_error("Arquivo do pip não encontrado na pasta requirements. Não foi possível atualizar o pip.")
+    return False
+
 def instalar_pacotes(pip_path: str, pasta_requirements: Path):
     """Instala os pacotes da pasta requirements."""
     pacotes = ler_requirements()
@@ -461,13 +928,18 @@ def instalar_pacotes(pip_path: str, pasta_requirements: Path):
         
         if arquivos_encontrados:
             arquivo = arquivos_encontrados[0]
-            print_info(f"Instalando {nome_pacote}...")
+            print_info(f"Instalando {nome_pacote}...", pacote=nome_pacote, fase="instalacao")
             # Usa o caminho absoluto do arquivo
             caminho_arquivo = str(arquivo.absolute())
-            subprocess.run([pip_path, "install", "--no-index", "--find-links", str(pasta_requirements.absolute()), pacote], check=True)
+            with medir_fase("instalacao", nome_pacote):
+                subprocess.run([pip_path, "install", "--no-index", "--find-links", str(pasta_requirements.absolute()), pacote], check=True)
+            registrar_uso(pasta_requirements, arquivos_encontrados)
+        elif not disjuntor.disponivel():
+            raise FileNotFoundError(f"Arquivo não encontrado para {nome_pacote} em requirements/ (sem acesso ao PyPI)")
         else:
-            print_warning(f"Arquivo não encontrado para {nome_pacote}, instalando da internet...")
-            subprocess.run([pip_path, "install", pacote], check=True)
+            print_warning(f"Arquivo não encontrado para {nome_pacote}, instalando da internet...", pacote=nome_pacote, fase="instalacao")
+            with medir_fase("instalacao", nome_pacote):
+                subprocess.run([pip_path, "install", pacote], check=True)
     
     print_success("Todos os pacotes foram instalados com sucesso!")
 
@@ -486,12 +958,14 @@ def instalar_pacotes_pasta_existente(pip_path: str, pasta_requirements: Path):
         if not versao:
             continue
             
-        print_info(f"Instalando {nome_pacote}...")
+        print_info(f"Instalando {nome_pacote}...", pacote=nome_pacote, fase="instalacao")
         try:
-            subprocess.run([pip_path, "install", "--no-index", "--find-links", str(pasta_requirements.absolute()), pacote], check=True)
-            print_success(f"✓ {nome_pacote} instalado com sucesso!")
+            with medir_fase("instalacao", nome_pacote):
+                subprocess.run([pip_path, "install", "--no-index", "--find-links", str(pasta_requirements.absolute()), pacote], check=True)
+            registrar_uso(pasta_requirements, localizar_artefatos(pasta_requirements, pacote))
+            print_success(f"✓ {nome_pacote} instalado com sucesso!", pacote=nome_pacote, fase="instalacao")
         except subprocess.CalledProcessError as e:
-            print_error(f"✗ Erro ao instalar {nome_pacote}: {e}")
+            print_error(f"✗ Erro ao instalar {nome_pacote}: {e}", pacote=nome_pacote, fase="instalacao")
             return False
     
     print_success("Todos os pacotes da pasta requirements foram instalados com sucesso!")
@@ -507,30 +981,26 @@ def instalar_pacotes_ambiente_desenvolvimento(pip_path: str, pasta_requirements:
     
     print_highlight(f"\nInstalando {len(pacotes_ambiente)} pacotes do ambiente de desenvolvimento...")
     
-    # Primeiro baixa todos os pacotes
-    print_info("Baixando pacotes do ambiente de desenvolvimento...")
-    for pacote in pacotes_ambiente:
-        if not baixar_pacote(pacote, pasta_requirements):
-            print_warning(f"Falha ao baixar {pacote}, continuando...")
-    
-    # Depois instala todos
-    print_info("Instalando pacotes...")
-    for pacote in pacotes_ambiente:
-        nome_pacote, versao = extrair_nome_versao(pacote)
-        if not versao:
-            continue
-            
-        print_info(f"Instalando {nome_pacote}...")
-        try:
-            subprocess.run([pip_path, "install", "--no-index", "--find-links", str(pasta_requirements.absolute()), pacote], check=True)
-            print_success(f"✓ {nome_pacote} instalado com sucesso!")
-        except subprocess.CalledProcessError as e:
-            print_error(f"✗ Erro ao instalar {nome_pacote}: {e}")
-            return False
+    # Downloads e instalações em paralelo, cada pacote instalado assim que suas dependências estiverem prontas
+    if not ExecutorPipeline(pacotes_ambiente, pasta_requirements, pip_path).executar():
+        return False
     
     print_success("Todos os pacotes do ambiente de desenvolvimento foram instalados com sucesso!")
     return True
 
+def baixar_e_instalar(pacotes: List[str], pip_path: str, pasta_requirements: Path):
+    """Baixa os pacotes do requirements.txt e, se confirmado, instala-os à medida que são baixados.
+
+    Retorna None se o usuário optar por apenas baixar.
+    """
+    if confirmar_acao("instalar os pacotes à medida que forem baixados"):
+        return ExecutorPipeline(pacotes, pasta_requirements, pip_path).executar()
+    
+    print_info("Baixando pacotes do requirements.txt...")
+    for pacote in pacotes:
+        baixar_pacote(pacote, pasta_requirements)
+    return None
+
 def atualizar_pacotes_existentes(pasta_requirements: Path):
     """Atualiza os pacotes existentes na pasta requirements."""
     pacotes_existentes = listar_pacotes_pasta(pasta_requirements)
@@ -543,7 +1013,7 @@ def atualizar_pacotes_existentes(pasta_requirements: Path):
     
     # Remove todos os arquivos existentes
     for arquivo in pasta_requirements.iterdir():
-        if arquivo.is_file() and (arquivo.suffix == '.whl' or arquivo.suffixes == ['.tar', '.gz']):
+        if eh_artefato(arquivo):
             arquivo.unlink()
             print_info(f"Removido: {arquivo.name}")
     
@@ -608,10 +1078,8 @@ def contar_pacotes_pasta(pasta_requirements: Path) -> int:
     if not pasta_requirements.exists():
         return 0
     
-    # Conta arquivos .whl e .tar.gz
-    whl_files = list(pasta_requirements.glob("*.whl"))
-    tar_files = list(pasta_requirements.glob("*.tar.gz"))
-    return len(whl_files) + len(tar_files)
+    # Conta arquivos .whl, .tar.gz, ...
+    return sum(1 for arquivo in pasta_requirements.iterdir() if eh_artefato(arquivo))
 
 def listar_pacotes_pasta(pasta_requirements: Path) -> List[str]:
     """Lista os pacotes disponíveis na pasta requirements."""
@@ -620,21 +1088,1566 @@ def listar_pacotes_pasta(pasta_requirements: Path) -> List[str]:
     
     pacotes = []
     for arquivo in pasta_requirements.iterdir():
-        if arquivo.is_file() and (arquivo.suffix == '.whl' or arquivo.suffixes == ['.tar', '.gz']):
-            # Extrai nome e versão do nome do arquivo
-            nome_arquivo = arquivo.stem
-            if arquivo.suffixes == ['.tar', '.gz']:
-                nome_arquivo = arquivo.stem.replace('.tar', '')
-            
-            # Remove extensões e números de build
-            partes = nome_arquivo.split('-')
-            if len(partes) >= 2:
-                nome = partes[0]
-                versao = partes[1]
+        if eh_artefato(arquivo):
+            # Extrai nome e versão do nome do arquivo (wheel PEP 427, 'nome-versão.whl' ou sdist)
+            nome, versao = dividir_nome_artefato(arquivo.name)
+            if nome and versao:
                 pacotes.append(f"{nome}=={versao}")
     
     return sorted(pacotes)
 
+# Executor em pipeline: downloads e instalações em estágios sobrepostos
+DOWNLOADS_SIMULTANEOS = 4
+
+def nome_requisito(requisito: str) -> str:
+    """Extrai o nome normalizado do projeto de um requisito (ex.: 'urllib3<3,>=1.21' -> 'urllib3')."""
+    match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', requisito)
+    return normalizar_nome(match.group(1)) if match else normalizar_nome(requisito.strip())
+
+def _maior_versao(versoes, requisito) -> Optional[str]:
+    """Retorna a maior versão que satisfaz o requisito, preferindo versões estáveis a pré-lançamentos."""
+    validas = []
+    for versao in versoes:
+        try:
+            if requisito is None or versao in requisito:
+                validas.append((pkg_resources.parse_version(versao), versao))
+        except ValueError:
+            continue  # versão fora do padrão PEP 440
+    estaveis = [item for item in validas if not item[0].is_prerelease]
+    return max(estaveis or validas)[1] if validas else None
+
+def resolver_requisito(requisito_texto: str, pasta_requirements: Path = None) -> Optional[str]:
+    """Escolhe a versão de uma dependência que não foi fixada, retornando 'nome==versão'.
+
+    Prefere a maior versão presente em pasta_requirements que satisfaz o requisito;
+    senão, a maior versão estável publicada no PyPI. Retorna None se nenhuma servir.
+    """
+    nome = nome_requisito(requisito_texto)
+    try:
+        requisito = pkg_resources.Requirement.parse(requisito_texto)
+    except Exception:
+        requisito = None
+    
+    if pasta_requirements is not None and pasta_requirements.exists():
+        locais = {
+            versao_artefato(arquivo.name) for arquivo in pasta_requirements.iterdir()
+            if eh_artefato(arquivo) and nome_projeto_artefato(arquivo.name) == nome
+        }
+        versao = _maior_versao(locais, requisito)
+        if versao:
+            return f"{nome}=={versao}"
+    
+    if not disjuntor.disponivel("pypi.org"):
+        return None
+    try:
+        versao = _maior_versao(obter_versoes_pypi(nome), requisito)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Erro ao obter versões de {nome} no PyPI: {e}")
+        return None
+    return f"{nome}=={versao}" if versao else None
+
+def montar_grafo_dependencias(pacotes: List[str], max_workers: int = DOWNLOADS_SIMULTANEOS,
+                              pasta_requirements: Path = None) -> Tuple[Dict[str, Set[str]], Dict[str, str], List[Dict]]:
+    """Monta o grafo pacote -> dependências, expandido até o fecho transitivo.
+
+    Dependências que não estão entre os pacotes informados recebem uma versão via
+    resolver_requisito e são expandidas também. As consultas de cada nível são
+    feitas em paralelo; wheels já presentes em pasta_requirements são lidos localmente.
+
+    Retorna (grafo, pacotes por nome incluindo os adicionados, dependências não resolvidas).
+    """
+    por_nome = {nome_requisito(pacote): pacote for pacote in pacotes}
+    grafo: Dict[str, Set[str]] = {}
+    nao_resolvidos: List[Dict] = []
+    descartados: Set[str] = set()
+    
+    def dependencias(pacote: str) -> List[str]:
+        nome_pacote, versao = extrair_nome_versao(pacote)
+        if not versao:
+            return []
+        return obter_dependencias(nome_pacote, versao, pasta_requirements)
+    
+    nivel = list(por_nome)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while nivel:
+            resultados = dict(zip(nivel, pool.map(lambda nome: dependencias(por_nome[nome]), nivel)))
+            novos: Dict[str, Tuple[str, str]] = {}  # nome -> (requisito, requerido por)
+            for nome, deps in resultados.items():
+                grafo[nome] = set()
+                for dep in deps:
+                    dep_nome = nome_requisito(dep)
+                    if dep_nome == nome:
+                        continue
+                    grafo[nome].add(dep_nome)
+                    if dep_nome not in por_nome and dep_nome not in descartados and dep_nome not in novos:
+                        novos[dep_nome] = (dep, por_nome[nome])
+            
+            escolhidos = pool.map(lambda item: resolver_requisito(item[0], pasta_requirements), novos.values())
+            nivel = []
+            for (dep_nome, (dep, origem)), pacote in zip(novos.items(), escolhidos):
+                if pacote is None:
+                    descartados.add(dep_nome)
+                    nao_resolvidos.append({"requisito": dep, "requerido_por": origem})
+                else:
+                    por_nome[dep_nome] = pacote
+                    nivel.append(dep_nome)
+    
+    if pasta_requirements is not None:
+        gravar_requires_dist(pasta_requirements)
+    grafo = {nome: {dep for dep in deps if dep in por_nome} for nome, deps in grafo.items()}
+    return grafo, por_nome, nao_resolvidos
+
+def ordenar_grafo(grafo: Dict[str, Set[str]]) -> List[str]:
+    """Ordena o grafo topologicamente (dependências primeiro).
+
+    Ciclos são quebrados escolhendo, entre os pacotes do ciclo, o que tem menos
+    dependências pendentes. Dependências fora do grafo são ignoradas.
+    """
+    pendentes = {nome: set(deps) & grafo.keys() for nome, deps in grafo.items()}
+    ordem = []
+    while pendentes:
+        prontos = sorted(nome for nome, deps in pendentes.items() if not deps)
+        if not prontos:
+            # Sem pacote pronto, seguir as dependências sempre chega a um ciclo
+            caminho, atual = [], min(pendentes)
+            while atual not in caminho:
+                caminho.append(atual)
+                atual = min(pendentes[atual])
+            ciclo = caminho[caminho.index(atual):]
+            escolhido = min(ciclo, key=lambda nome: (len(pendentes[nome]), nome))
+            logger.debug(f"Ciclo de dependências quebrado em {escolhido}: {sorted(pendentes[escolhido])}")
+            prontos = [escolhido]
+        for nome in prontos:
+            ordem.append(nome)
+            del pendentes[nome]
+        for deps in pendentes.values():
+            deps.difference_update(prontos)
+    return ordem
+
+def formatar_bytes(quantidade: int) -> str:
+    """Formata uma quantidade de bytes em unidade legível."""
+    valor = float(quantidade)
+    for unidade in ("B", "KB", "MB", "GB"):
+        if valor < 1024 or unidade == "GB":
+            return f"{valor:.0f} {unidade}" if unidade == "B" else f"{valor:.1f} {unidade}"
+        valor /= 1024
+
+def localizar_artefatos(pasta_requirements: Path, pacote: str) -> List[Path]:
+    """Localiza os arquivos de um pacote (nome==versão) na pasta requirements."""
+    nome_pacote, versao = extrair_nome_versao(pacote)
+    if not versao or not pasta_requirements.exists():
+        return []
+    # Compara nome normalizado e versão exata: 'foo==1.0' não encontra foo-1.0.1 e encontra Foo_Bar/foo-bar
+    alvo = (normalizar_nome(nome_pacote), versao)
+    return [
+        arquivo for arquivo in pasta_requirements.glob("*-*")
+        if arquivo.is_file() and not arquivo.name.endswith((".part", ".tmp"))
+        and (nome_projeto_artefato(arquivo.name), versao_artefato(arquivo.name)) == alvo
+    ]
+
+class ExecutorPipeline:
+    """Baixa e instala pacotes em estágios sobrepostos, guiado pelo grafo de dependências.
+
+    Os downloads rodam em paralelo, na ordem topológica; cada pacote é instalado
+    assim que ele e todas as suas dependências foram baixados, verificados e
+    (no caso das dependências) instalados.
+    """
+
+    def __init__(self, pacotes: List[str], pasta_requirements: Path, pip_path: str = None,
+                 downloads_simultaneos: int = DOWNLOADS_SIMULTANEOS):
+        self.pasta = pasta_requirements
+        self.pip_path = pip_path
+        self.downloads_simultaneos = downloads_simultaneos
+        
+        print_info(f"Resolvendo grafo de dependências de {len(pacotes)} pacotes...")
+        with medir_fase("resolucao"):
+            grafo, self.pacotes, self.nao_resolvidos = montar_grafo_dependencias(pacotes, downloads_simultaneos, pasta_requirements)
+        informados = {nome_requisito(pacote) for pacote in pacotes}
+        self.adicionados = sorted(self.pacotes[nome] for nome in self.pacotes if nome not in informados)
+        if self.adicionados:
+            print_info(f"Dependências transitivas adicionadas ({len(self.adicionados)}): {', '.join(self.adicionados)}")
+        for item in self.nao_resolvidos:
+            print_warning(f"Dependência não resolvida: {item['requisito']} (requerida por {item['requerido_por']})")
+        self.ordem = ordenar_grafo(grafo)
+        posicao = {nome: i for i, nome in enumerate(self.ordem)}
+        # Mantém apenas arestas para pacotes anteriores na ordem: garante um DAG mesmo com ciclos
+        self.dependencias = {
+            nome: {dep for dep in grafo[nome] if posicao[dep] < posicao[nome]}
+            for nome in self.ordem
+        }
+
+    def _tamanho_estimado(self, nome: str) -> Tuple[int, str]:
+        """Retorna (bytes, origem) de um pacote: local, PyPI ou desconhecido."""
+        arquivos = localizar_artefatos(self.pasta, self.pacotes[nome])
+        if arquivos:
+            return arquivos[0].stat().st_size, "local"
+        nome_pacote, versao = extrair_nome_versao(self.pacotes[nome])
+        if not versao:
+            return 0, "?"
+        try:
+            urls = obter_json_pypi(nome_pacote, versao).get("urls", [])
+        except (requests.exceptions.RequestException, ValueError):
+            return 0, "?"
+        # Mesma preferência do download: wheel universal, outro wheel, sdist
+        candidatos = sorted(
+            urls,
+            key=lambda u: (u.get("packagetype") != "bdist_wheel", "none-any" not in u.get("filename", "")),
+        )
+        for url_info in candidatos:
+            if url_info.get("size"):
+                return url_info["size"], "pypi"
+        return 0, "?"
+
+    def planejar(self) -> List[Dict]:
+        """Monta o plano de execução: nível no DAG, dependências e bytes estimados de cada pacote."""
+        niveis: Dict[str, int] = {}
+        for nome in self.ordem:
+            niveis[nome] = 1 + max((niveis[dep] for dep in self.dependencias[nome]), default=-1)
+        with ThreadPoolExecutor(max_workers=self.downloads_simultaneos) as pool:
+            tamanhos = dict(zip(self.ordem, pool.map(self._tamanho_estimado, self.ordem)))
+        return [
+            {
+                "pacote": self.pacotes[nome],
+                "nivel": niveis[nome],
+                "dependencias": sorted(self.dependencias[nome]),
+                "bytes": tamanhos[nome][0],
+                "origem": tamanhos[nome][1],
+                "transitiva": self.pacotes[nome] in self.adicionados,
+            }
+            for nome in self.ordem
+        ]
+
+    def exibir_plano(self):
+        """Exibe o plano (dry-run) sem baixar nem instalar nada."""
+        plano = self.planejar()
+        print_highlight(f"\nPlano de execução ({len(plano)} pacotes):")
+        nivel_atual = None
+        for etapa in sorted(plano, key=lambda etapa: etapa["nivel"]):
+            if etapa["nivel"] != nivel_atual:
+                nivel_atual = etapa["nivel"]
+                print(f"{Fore.CYAN}Nível {nivel_atual}:")
+            deps = f" <- {', '.join(etapa['dependencias'])}" if etapa["dependencias"] else ""
+            marca = "+" if etapa["transitiva"] else " "
+            print(f" {marca}{etapa['pacote']:<40} {formatar_bytes(etapa['bytes']):>10} [{etapa['origem']}]{deps}")
+        a_baixar = sum(etapa["bytes"] for etapa in plano if etapa["origem"] != "local")
+        locais = sum(etapa["bytes"] for etapa in plano if etapa["origem"] == "local")
+        desconhecidos = sum(1 for etapa in plano if etapa["origem"] == "?")
+        print_info(f"\nA baixar: {formatar_bytes(a_baixar)} | já na pasta requirements: {formatar_bytes(locais)}")
+        if desconhecidos:
+            print_warning(f"{desconhecidos} pacote(s) sem tamanho conhecido")
+        if self.adicionados:
+            print_info(f"+ dependência transitiva fora da lista de pacotes ({len(self.adicionados)})")
+        if self.nao_resolvidos:
+            print_warning(f"{len(self.nao_resolvidos)} dependência(s) sem versão disponível; a instalação dos pacotes que as requerem vai falhar:")
+            for item in self.nao_resolvidos:
+                print_warning(f"  {item['requisito']} (requerida por {item['requerido_por']})")
+        return plano
+
+    def _baixar(self, nome: str) -> bool:
+        """Baixa um pacote e verifica o arquivo obtido."""
+        pacote = self.pacotes[nome]
+        arquivo = baixar_pacote(pacote, self.pasta)
+        if arquivo is None:
+            return False
+        try:
+            valido = arquivo.stat().st_size > 0 and (not arquivo.name.endswith('.whl') or zipfile.is_zipfile(arquivo))
+        except OSError:
+            valido = False
+        if not valido:
+            print_error(f"✗ Arquivo {arquivo.name} ausente ou inválido após o download", pacote=nome, fase="verificacao")
+        return valido
+
+    def _instalar(self, nome: str) -> bool:
+        pacote = self.pacotes[nome]
+        print_info(f"Instalando {nome}...", pacote=nome, fase="instalacao")
+        try:
+            with medir_fase("instalacao", nome):
+                subprocess.run([self.pip_path, "install", "--no-index", "--find-links", str(self.pasta.absolute()), pacote], check=True)
+            registrar_uso(self.pasta, localizar_artefatos(self.pasta, pacote))
+            print_success(f"✓ {nome} instalado com sucesso!", pacote=nome, fase="instalacao")
+            return True
+        except subprocess.CalledProcessError as e:
+            print_error(f"✗ Erro ao instalar {nome}: {e}", pacote=nome, fase="instalacao")
+            return False
+
+    def executar(self) -> bool:
+        """Executa o pipeline. Retorna True se todos os pacotes foram instalados."""
+        self.pasta.mkdir(exist_ok=True)
+        inicio = time.perf_counter()
+        concluidos = queue.Queue()
+        baixados: Set[str] = set()
+        instalados: Set[str] = set()
+        falhos: Set[str] = set()
+        
+        with ThreadPoolExecutor(max_workers=self.downloads_simultaneos) as pool:
+            for nome in self.ordem:
+                futuro = pool.submit(self._baixar, nome)
+                futuro.add_done_callback(lambda f, nome=nome: concluidos.put((nome, f)))
+            
+            # O estágio de instalação roda nesta thread enquanto os downloads continuam no pool
+            for _ in range(len(self.ordem)):
+                nome, futuro = concluidos.get()
+                if futuro.exception() is None and futuro.result():
+                    baixados.add(nome)
+                else:
+                    if futuro.exception() is not None:
+                        print_error(f"✗ Erro ao baixar {nome}: {futuro.exception()}", pacote=nome, fase="download")
+                    falhos.add(nome)
+                
+                houve_progresso = True
+                while houve_progresso:
+                    houve_progresso = False
+                    for candidato in self.ordem:
+                        if (candidato in baixados and candidato not in instalados and candidato not in falhos
+                                and self.dependencias[candidato] <= instalados):
+                            if self._instalar(candidato):
+                                instalados.add(candidato)
+                            else:
+                                falhos.add(candidato)
+                            houve_progresso = True
+        
+        bloqueados = [nome for nome in self.ordem if nome not in instalados and nome not in falhos]
+        duracao = time.perf_counter() - inicio
+        logger.debug("Pipeline finalizado", extra={"fase": "pipeline", "duracao": round(duracao, 3)})
+        print_info(f"\nInstalados: {len(instalados)} | falhas: {len(falhos)} | bloqueados por dependências: {len(bloqueados)} | tempo: {duracao:.1f}s")
+        if falhos:
+            print_error(f"Pacotes com falha: {', '.join(sorted(falhos))}")
+        if bloqueados:
+            print_warning(f"Pacotes não instalados por falha em dependências: {', '.join(bloqueados)}")
+        return not falhos and not bloqueados
+
+# Manifesto do wheelhouse (requirements/manifest.json)
+MANIFESTO_ARQUIVO = "manifest.json"
+MANIFESTO_VERSAO = 1
+
+LIMIAR_MMAP = 8 * 1024 * 1024  # arquivos a partir deste tamanho são lidos via mmap
+
+# Extensões reconhecidas como artefatos; '.gz' cobre sdists baixados por versões
+# anteriores do Hermes, que gravavam 'nome-versao.gz' em vez de '.tar.gz'
+EXTENSOES_ARTEFATO = ('.whl', '.tar.gz', '.zip', '.gz')
+
+# Serializa leituras/escritas do manifesto entre threads (servidor, downloads)
+_trava_manifesto = threading.RLock()
+_manifestos_travados: Set[str] = set()  # pastas cujo lock de arquivo está com este processo
+
+# Requires-Dist lidos nesta execução: caminho do wheel -> (tamanho, mtime, requires_dist)
+_requires_dist_lidos: Dict[str, Tuple[int, float, List[str]]] = {}
+# Pastas cujo manifesto já foi carregado no cache acima, e wheels lidos ainda não gravados nele
+_pastas_semeadas: Set[str] = set()
+_requires_dist_pendentes: Dict[str, Set[str]] = {}
+
+def normalizar_nome(nome: str) -> str:
+    """Normaliza o nome de um projeto conforme a PEP 503."""
+    return re.sub(r"[-_.]+", "-", nome).lower()
+
+def extensao_artefato(nome_arquivo: str) -> str:
+    """Retorna a extensão de artefato do nome do arquivo (ex.: '.tar.gz') ou '' se não for um artefato."""
+    for extensao in EXTENSOES_ARTEFATO:
+        if nome_arquivo.endswith(extensao):
+            return extensao
+    return ""
+
+def eh_artefato(arquivo: Path) -> bool:
+    """Indica se o arquivo é um pacote distribuível (ver EXTENSOES_ARTEFATO)."""
+    return arquivo.is_file() and bool(extensao_artefato(arquivo.name))
+
+def dividir_nome_artefato(nome_arquivo: str) -> Tuple[str, str]:
+    """Separa o nome de um artefato em (projeto, versão).
+
+    Wheels PEP 427 (nome-versão[-build]-python-abi-plataforma.whl) têm ao menos 5
+    partes; os demais, incluindo os wheels gravados pelo Hermes como
+    'nome-versão.whl', são divididos no último '-' como os sdists.
+    """
+    partes = nome_arquivo.split('-')
+    if nome_arquivo.endswith('.whl') and len(partes) >= 5:
+        return partes[0], partes[1]
+    base = nome_arquivo[:len(nome_arquivo) - len(extensao_artefato(nome_arquivo))]
+    projeto, separador, versao = base.rpartition('-')
+    return (projeto, versao) if separador else (base, "")
+
+def nome_projeto_artefato(nome_arquivo: str) -> str:
+    """Extrai o nome normalizado do projeto a partir do nome de um wheel ou sdist."""
+    return normalizar_nome(dividir_nome_artefato(nome_arquivo)[0])
+
+def calcular_sha256(arquivo: Path) -> str:
+    """Calcula o sha256 de um arquivo.
+
+    Arquivos grandes são mapeados em memória (mmap) e passados de uma vez ao hashlib,
+    que libera o GIL durante o cálculo; os pequenos são lidos em blocos.
+    """
+    h = hashlib.sha256()
+    with open(arquivo, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= LIMIAR_MMAP:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                h.update(mapa)
+        else:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloco)
+    return h.hexdigest()
+
+def carregar_manifesto(pasta_requirements: Path) -> Dict:
+    """Carrega o manifesto do wheelhouse, retornando um manifesto vazio se não existir ou for inválido."""
+    caminho = pasta_requirements / MANIFESTO_ARQUIVO
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        return {"versao": MANIFESTO_VERSAO, "arquivos": {}}
+    if manifesto.get("versao") != MANIFESTO_VERSAO or not isinstance(manifesto.get("arquivos"), dict):
+        logger.debug(f"Manifesto inválido ou de versão diferente em {caminho}, recriando")
+        return {"versao": MANIFESTO_VERSAO, "arquivos": {}}
+    return manifesto
+
+@contextmanager
+def trava_manifesto(pasta_requirements: Path):
+    """Serializa leitura-modificação-gravação do manifesto entre threads e entre processos.
+
+    Além da RLock do processo, obtém um lock no arquivo manifest.json.lock (serve,
+    install e matrix podem rodar ao mesmo tempo). Chamadas aninhadas na mesma
+    thread reaproveitam o lock já obtido.
+    """
+    chave = str(pasta_requirements)
+    with _trava_manifesto:
+        if chave in _manifestos_travados or not pasta_requirements.is_dir():
+            yield
+            return
+        with open(pasta_requirements / (MANIFESTO_ARQUIVO + ".lock"), 'a+b') as f:
+            _travar_arquivo(f, True)
+            _manifestos_travados.add(chave)
+            try:
+                yield
+            finally:
+                _manifestos_travados.discard(chave)
+                _travar_arquivo(f, False)
+
+def salvar_manifesto(pasta_requirements: Path, manifesto: Dict):
+    """Grava o manifesto de forma atômica (arquivo temporário exclusivo + rename)."""
+    caminho = pasta_requirements / MANIFESTO_ARQUIVO
+    with trava_manifesto(pasta_requirements):
+        descritor, temporario = tempfile.mkstemp(dir=pasta_requirements, prefix=MANIFESTO_ARQUIVO + ".", suffix=".tmp")
+        try:
+            with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+                json.dump(manifesto, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temporario, caminho)
+        except BaseException:
+            try:
+                os.unlink(temporario)
+            except OSError:
+                pass
+            raise
+
+def _entrada_manifesto(arquivo: Path, entrada_anterior: Dict = None) -> Dict:
+    """Monta a entrada do manifesto de um artefato, reaproveitando a anterior se o arquivo não mudou."""
+    stat = arquivo.stat()
+    if (entrada_anterior
+            and entrada_anterior.get("tamanho") == stat.st_size
+            and entrada_anterior.get("mtime") == stat.st_mtime):
+        return entrada_anterior
+    entrada = {
+        "projeto": nome_projeto_artefato(arquivo.name),
+        "tamanho": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": calcular_sha256(arquivo),
+    }
+    if entrada_anterior and "ultimo_uso" in entrada_anterior:
+        entrada["ultimo_uso"] = entrada_anterior["ultimo_uso"]
+    lido = _requires_dist_lidos.get(str(arquivo))
+    if lido and lido[:2] == (stat.st_size, stat.st_mtime):
+        entrada["requires_dist"] = lido[2]
+    return entrada
+
+def atualizar_manifesto(pasta_requirements: Path) -> Dict:
+    """Sincroniza o manifesto com os artefatos presentes na pasta requirements.
+
+    Apenas arquivos novos ou modificados são (re)calculados; entradas de arquivos
+    removidos são descartadas.
+    """
+    with trava_manifesto(pasta_requirements):
+        manifesto = carregar_manifesto(pasta_requirements)
+        if not pasta_requirements.exists():
+            return manifesto
+        anteriores = manifesto["arquivos"]
+        atuais = {}
+        for arquivo in pasta_requirements.iterdir():
+            if eh_artefato(arquivo):
+                atuais[arquivo.name] = _entrada_manifesto(arquivo, anteriores.get(arquivo.name))
+        if atuais != anteriores:
+            manifesto["arquivos"] = atuais
+            salvar_manifesto(pasta_requirements, manifesto)
+        return manifesto
+
+def registrar_artefato(pasta_requirements: Path, arquivo: Path) -> Dict:
+    """Adiciona (ou atualiza) um único artefato no manifesto e retorna sua entrada.
+
+    O registro conta como uso do artefato (ver registrar_uso).
+    """
+    with trava_manifesto(pasta_requirements):
+        manifesto = carregar_manifesto(pasta_requirements)
+        entrada = _entrada_manifesto(arquivo, manifesto["arquivos"].get(arquivo.name))
+        entrada["ultimo_uso"] = time.time()
+        manifesto["arquivos"][arquivo.name] = entrada
+        salvar_manifesto(pasta_requirements, manifesto)
+        return entrada
+
+def registrar_uso(pasta_requirements: Path, arquivos: List[Path]):
+    """Atualiza o horário de último uso dos artefatos (downloads e instalações), usado pela coleta LRU."""
+    arquivos = [arquivo for arquivo in arquivos if eh_artefato(arquivo)]
+    if not arquivos:
+        return
+    with trava_manifesto(pasta_requirements):
+        manifesto = carregar_manifesto(pasta_requirements)
+        agora = time.time()
+        for arquivo in arquivos:
+            entrada = _entrada_manifesto(arquivo, manifesto["arquivos"].get(arquivo.name))
+            entrada["ultimo_uso"] = agora
+            manifesto["arquivos"][arquivo.name] = entrada
+        salvar_manifesto(pasta_requirements, manifesto)
+
+# Metadados locais dos wheels (resolução de dependências offline)
+def ler_requires_dist_wheel(arquivo: Path) -> List[str]:
+    """Lê os Requires-Dist do *.dist-info/METADATA de um wheel, sem extraí-lo.
+
+    Apenas o membro METADATA é descomprimido e só os cabeçalhos são interpretados.
+    """
+    with zipfile.ZipFile(arquivo) as wheel:
+        membros = [
+            nome for nome in wheel.namelist()
+            if nome.count('/') == 1 and nome.endswith('.dist-info/METADATA')
+        ]
+        if not membros:
+            raise ValueError(f"METADATA não encontrado em {arquivo.name}")
+        cabecalhos = BytesHeaderParser().parsebytes(wheel.read(membros[0]))
+    return cabecalhos.get_all('Requires-Dist') or []
+
+def metadados_wheelhouse(pasta_requirements: Path) -> Dict:
+    """Garante que todos os wheels do manifesto tenham os Requires-Dist em cache e retorna o manifesto.
+
+    Só os wheels novos ou modificados são lidos; o manifesto é gravado uma única vez.
+    """
+    with trava_manifesto(pasta_requirements):
+        manifesto = atualizar_manifesto(pasta_requirements)
+        alterado = False
+        for nome_arquivo, entrada in manifesto["arquivos"].items():
+            if nome_arquivo.endswith('.whl') and "requires_dist" not in entrada:
+                requires_dist = requires_dist_wheel(pasta_requirements / nome_arquivo)
+                if requires_dist is not None:
+                    entrada["requires_dist"] = requires_dist
+                    alterado = True
+        if alterado:
+            salvar_manifesto(pasta_requirements, manifesto)
+        _requires_dist_pendentes.pop(str(pasta_requirements), None)
+        return manifesto
+
+def requires_dist_wheel(arquivo: Path) -> List[str]:
+    """Retorna os Requires-Dist de um wheel local, lendo o METADATA só se não estiverem em cache.
+
+    O cache é validado pelo tamanho e mtime do arquivo (sem calcular o sha256) e
+    semeado uma vez por pasta a partir do manifesto. Leituras novas ficam pendentes
+    até gravar_requires_dist. Retorna None se o wheel não puder ser lido.
+    """
+    pasta = str(arquivo.parent)
+    stat = arquivo.stat()
+    with _trava_manifesto:
+        if pasta not in _pastas_semeadas:
+            for nome_arquivo, entrada in carregar_manifesto(arquivo.parent)["arquivos"].items():
+                if "requires_dist" in entrada:
+                    _requires_dist_lidos[os.path.join(pasta, nome_arquivo)] = (
+                        entrada["tamanho"], entrada["mtime"], entrada["requires_dist"])
+            _pastas_semeadas.add(pasta)
+        lido = _requires_dist_lidos.get(str(arquivo))
+    if lido and lido[:2] == (stat.st_size, stat.st_mtime):
+        return lido[2]
+    
+    try:
+        requires_dist = ler_requires_dist_wheel(arquivo)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        logger.error(f"Erro ao ler metadados de {arquivo.name}: {e}")
+        return None
+    with _trava_manifesto:
+        _requires_dist_lidos[str(arquivo)] = (stat.st_size, stat.st_mtime, requires_dist)
+        _requires_dist_pendentes.setdefault(pasta, set()).add(arquivo.name)
+    return requires_dist
+
+def gravar_requires_dist(pasta_requirements: Path):
+    """Grava no manifesto, de uma só vez, os Requires-Dist lidos desde a última gravação.
+
+    Só entradas com o mesmo tamanho e mtime são atualizadas; wheels ainda fora do
+    manifesto recebem os Requires-Dist do cache quando forem registrados.
+    """
+    with trava_manifesto(pasta_requirements):
+        pendentes = _requires_dist_pendentes.pop(str(pasta_requirements), set())
+        if not pendentes:
+            return
+        manifesto = carregar_manifesto(pasta_requirements)
+        alterado = False
+        for nome_arquivo in pendentes:
+            entrada = manifesto["arquivos"].get(nome_arquivo)
+            tamanho, mtime, requires_dist = _requires_dist_lidos[str(pasta_requirements / nome_arquivo)]
+            if entrada and (entrada.get("tamanho"), entrada.get("mtime")) == (tamanho, mtime):
+                entrada["requires_dist"] = requires_dist
+                alterado = True
+        if alterado:
+            salvar_manifesto(pasta_requirements, manifesto)
+
+def obter_dependencias_locais(pasta_requirements: Path, nome_pacote: str, versao: str) -> List[str]:
+    """Obtém as dependências de um pacote pelo wheel local (com cache por tamanho e mtime).
+
+    Retorna None se não houver wheel legível do pacote na pasta requirements.
+    """
+    wheels = [arquivo for arquivo in localizar_artefatos(pasta_requirements, f"{nome_pacote}=={versao}")
+              if arquivo.name.endswith('.whl')]
+    if not wheels:
+        return None
+    requires_dist = requires_dist_wheel(wheels[0])
+    return None if requires_dist is None else limpar_requires_dist(requires_dist)
+
+def verificar_wheelhouse(pasta_requirements: Path, arquivos_pinos: List[Path]) -> Dict:
+    """Verifica, apenas com os metadados locais, se a pasta requirements é completa.
+
+    Parte dos pacotes fixados, resolve as dependências recursivamente escolhendo a
+    maior versão local que satisfaz cada requisito e calcula a ordem de instalação.
+    """
+    inicio = time.perf_counter()
+    manifesto = metadados_wheelhouse(pasta_requirements)
+    
+    # projeto -> [(versão, arquivo)], preferindo wheels a sdists
+    disponiveis: Dict[str, List[Tuple[str, str]]] = {}
+    for nome_arquivo, entrada in sorted(manifesto["arquivos"].items(), key=lambda item: not item[0].endswith('.whl')):
+        disponiveis.setdefault(entrada["projeto"], []).append((versao_artefato(nome_arquivo), nome_arquivo))
+    
+    pendentes = []
+    for arquivo in arquivos_pinos:
+        pendentes.extend((projeto, f"{projeto}=={versao}", "requirements") for projeto, versao in sorted(ler_pinos(arquivo)))
+    
+    escolhidos: Dict[str, Tuple[str, str]] = {}
+    grafo: Dict[str, Set[str]] = {}
+    faltantes = []
+    conflitos = []
+    sem_metadados = []
+    while pendentes:
+        projeto, requisito_texto, origem = pendentes.pop(0)
+        try:
+            requisito = pkg_resources.Requirement.parse(requisito_texto)
+        except Exception:
+            requisito = None
+        if projeto in escolhidos:
+            versao = escolhidos[projeto][0]
+            if requisito is not None and versao not in requisito:
+                conflitos.append({"requisito": requisito_texto, "requerido_por": origem, "versao_local": versao})
+            continue
+        candidatos = [
+            (versao, nome_arquivo) for versao, nome_arquivo in disponiveis.get(projeto, [])
+            if requisito is None or versao in requisito
+        ]
+        if not candidatos:
+            faltantes.append({"requisito": requisito_texto, "requerido_por": origem})
+            continue
+        versao, nome_arquivo = max(candidatos, key=lambda candidato: pkg_resources.parse_version(candidato[0]))
+        escolhidos[projeto] = (versao, nome_arquivo)
+        requires_dist = manifesto["arquivos"][nome_arquivo].get("requires_dist")
+        if requires_dist is None:
+            sem_metadados.append(nome_arquivo)
+            requires_dist = []
+        dependencias = limpar_requires_dist(requires_dist)
+        grafo[projeto] = {nome_requisito(dep) for dep in dependencias} - {projeto}
+        pendentes.extend((nome_requisito(dep), dep, f"{projeto}=={versao}") for dep in dependencias)
+    
+    ordem = ordenar_grafo({projeto: deps & set(escolhidos) for projeto, deps in grafo.items()})
+    return {
+        "completo": not faltantes and not conflitos,
+        "ordem_instalacao": [escolhidos[projeto][1] for projeto in ordem],
+        "faltantes": faltantes,
+        "conflitos": conflitos,
+        "sem_metadados": sem_metadados,
+        "duracao": round(time.perf_counter() - inicio, 4),
+    }
+
+# Auditoria de integridade do wheelhouse
+def verificar_record_wheel(arquivo: Path, profundo: bool = False) -> List[str]:
+    """Confere o diretório central do zip de um wheel com o seu RECORD.
+
+    Verifica se cada membro está no RECORD (e vice-versa) e se os tamanhos conferem.
+    Com profundo=True, também descomprime cada membro e confere o hash do RECORD.
+    Retorna a lista de problemas encontrados.
+    """
+    problemas = []
+    try:
+        with zipfile.ZipFile(arquivo) as wheel:
+            membros = {info.filename: info for info in wheel.infolist() if not info.is_dir()}
+            records = [nome for nome in membros if nome.count('/') == 1 and nome.endswith('.dist-info/RECORD')]
+            if len(records) != 1:
+                return [f"esperado 1 RECORD, encontrados {len(records)}"]
+            record = records[0]
+            
+            listados: Dict[str, Tuple[str, str]] = {}
+            with wheel.open(record) as f:
+                for linha in csv.reader(io.TextIOWrapper(f, encoding='utf-8')):
+                    if linha:
+                        caminho, hash_registrado, tamanho = (linha + ['', ''])[:3]
+                        listados[caminho] = (hash_registrado, tamanho)
+            
+            assinaturas = (record + ".jws", record + ".p7s")
+            for nome in membros:
+                if nome not in listados and nome not in assinaturas:
+                    problemas.append(f"{nome}: presente no zip mas fora do RECORD")
+            for caminho, (hash_registrado, tamanho) in listados.items():
+                info = membros.get(caminho)
+                if info is None:
+                    problemas.append(f"{caminho}: listado no RECORD mas ausente do zip")
+                    continue
+                if tamanho and tamanho != str(info.file_size):
+                    problemas.append(f"{caminho}: tamanho {info.file_size} difere do RECORD ({tamanho})")
+                if profundo and hash_registrado:
+                    algoritmo, separador, esperado = hash_registrado.partition('=')
+                    try:
+                        if not separador:
+                            raise ValueError("sem '='")
+                        h = hashlib.new(algoritmo)
+                    except ValueError as e:
+                        problemas.append(f"{caminho}: hash inválido no RECORD ({hash_registrado!r}: {e})")
+                        continue
+                    with wheel.open(info) as membro:
+                        for bloco in iter(lambda: membro.read(1024 * 1024), b''):
+                            h.update(bloco)
+                    obtido = base64.urlsafe_b64encode(h.digest()).rstrip(b'=').decode('ascii')
+                    if obtido != esperado:
+                        problemas.append(f"{caminho}: hash difere do RECORD")
+    except (zipfile.BadZipFile, OSError, ValueError, EOFError) as e:
+        problemas.append(f"zip inválido: {e}")
+    return problemas
+
+def _auditar_artefato(pasta_requirements: Path, nome_arquivo: str, entrada: Dict, profundo: bool) -> Dict:
+    """Audita um único artefato (executado em paralelo)."""
+    arquivo = pasta_requirements / nome_arquivo
+    resultado = {
+        "arquivo": nome_arquivo,
+        "sha256_registrado": entrada.get("sha256") if entrada else None,
+        "problemas": [],
+    }
+    if not arquivo.is_file():
+        resultado["status"] = "ausente"
+        return resultado
+    resultado["tamanho"] = arquivo.stat().st_size
+    resultado["sha256"] = calcular_sha256(arquivo)
+    if nome_arquivo.endswith('.whl'):
+        resultado["problemas"] = verificar_record_wheel(arquivo, profundo)
+    
+    if entrada is None:
+        resultado["status"] = "nao_registrado"
+    elif resultado["sha256"] != entrada.get("sha256"):
+        resultado["status"] = "hash_divergente"
+    elif resultado["problemas"]:
+        resultado["status"] = "record_inconsistente"
+    else:
+        resultado["status"] = "ok"
+    return resultado
+
+def auditar_wheelhouse(pasta_requirements: Path, profundo: bool = False, max_workers: int = None) -> Dict:
+    """Audita em paralelo todos os artefatos da pasta requirements contra os sha256 do manifesto.
+
+    O manifesto é lido sem ser atualizado, para que arquivos alterados após o
+    registro apareçam como divergentes.
+    """
+    inicio = time.perf_counter()
+    registrados = carregar_manifesto(pasta_requirements)["arquivos"]
+    presentes = set()
+    nao_reconhecidos = []
+    for arquivo in pasta_requirements.iterdir():
+        if eh_artefato(arquivo):
+            presentes.add(arquivo.name)
+        elif (arquivo.is_file() and arquivo.suffix != ".part"
+              and not arquivo.name.startswith(MANIFESTO_ARQUIVO)):  # manifesto, seu lock e temporários
+            nao_reconhecidos.append(arquivo.name)
+    nomes = sorted(presentes | set(registrados))
+    # Arquivos maiores primeiro: evita que um wheel grande fique sozinho no final
+    nomes.sort(key=lambda nome: -(registrados.get(nome) or {}).get("tamanho", 0))
+    
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        resultados = list(pool.map(
+            lambda nome: _auditar_artefato(pasta_requirements, nome, registrados.get(nome), profundo),
+            nomes,
+        ))
+    # Arquivos que não são artefatos nem o manifesto não podem ser verificados: nunca contam como íntegros
+    resultados.extend(
+        {"arquivo": nome, "status": "nao_reconhecido", "problemas": ["extensão não reconhecida como pacote"]}
+        for nome in nao_reconhecidos
+    )
+    resultados.sort(key=lambda resultado: resultado["arquivo"])
+    
+    duracao = time.perf_counter() - inicio
+    total_bytes = sum(resultado.get("tamanho", 0) for resultado in resultados)
+    resumo: Dict[str, int] = {}
+    for resultado in resultados:
+        resumo[resultado["status"]] = resumo.get(resultado["status"], 0) + 1
+    logger.debug(f"Auditoria: {resumo}", extra={"fase": "auditoria", "duracao": round(duracao, 3)})
+    return {
+        "pasta": str(pasta_requirements),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "profundo": profundo,
+        "workers": workers,
+        "duracao": round(duracao, 3),
+        "bytes": total_bytes,
+        "mb_por_segundo": round(total_bytes / (1024 * 1024) / duracao, 1) if duracao > 0 else None,
+        "integro": all(resultado["status"] == "ok" for resultado in resultados),
+        "resumo": resumo,
+        "arquivos": resultados,
+    }
+
+# Matriz de ambientes virtuais (vários interpretadores em paralelo)
+# Executado pelo python de cada venv: tags suportadas, em ordem de preferência, pelo packaging do pip
+SCRIPT_TAGS = (
+    "import json, sys\n"
+    "from pip._vendor.packaging import tags\n"
+    "print(json.dumps({'implementacao': sys.implementation.name, 'versao': '%d.%d' % sys.version_info[:2],"
+    " 'tags': [str(t) for t in tags.sys_tags()]}))"
+)
+
+def tags_wheel(nome_arquivo: str) -> Set[str]:
+    """Expande as tags (python-abi-plataforma) do nome de um wheel, incluindo conjuntos compactados."""
+    partes = nome_arquivo[:-len('.whl')].split('-')
+    if len(partes) < 5:
+        return set()
+    pythons, abis, plataformas = partes[-3:]
+    return {
+        f"{python}-{abi}-{plataforma}"
+        for python in pythons.split('.')
+        for abi in abis.split('.')
+        for plataforma in plataformas.split('.')
+    }
+
+def escolher_artefato(arquivos: List[Path], prioridade_tags: Dict[str, int]) -> Path:
+    """Escolhe o melhor wheel compatível (pela ordem das tags); sem wheel compatível, usa o sdist."""
+    melhor, melhor_prioridade = None, None
+    for arquivo in arquivos:
+        if not arquivo.name.endswith('.whl'):
+            continue
+        prioridades = [prioridade_tags[tag] for tag in tags_wheel(arquivo.name) if tag in prioridade_tags]
+        if prioridades and (melhor_prioridade is None or min(prioridades) < melhor_prioridade):
+            melhor, melhor_prioridade = arquivo, min(prioridades)
+    if melhor:
+        return melhor
+    sdists = [arquivo for arquivo in arquivos if not arquivo.name.endswith('.whl') and extensao_artefato(arquivo.name)]
+    return sdists[0] if sdists else None
+
+class AmbienteMatriz:
+    """Um ambiente da matriz: interpretador, venv e os tempos de cada etapa."""
+
+    def __init__(self, interpretador: str, venv_path: Path):
+        self.interpretador = interpretador
+        self.venv_path = venv_path
+        self.rotulo = venv_path.name
+        self.versao = None
+        self.python_path = None
+        self.tempos: Dict[str, float] = {}
+        self.instalados = 0
+        self.faltantes: List[str] = []
+        self.erro = None
+
+    def _etapa(self, nome: str, inicio: float):
+        self.tempos[nome] = time.perf_counter() - inicio
+        logger.debug(f"[{self.rotulo}] {nome} concluída", extra={"fase": f"matriz:{nome}", "duracao": round(self.tempos[nome], 3)})
+
+    def executar(self, pacotes: List[str], pasta_requirements: Path, travas_download: Dict[str, threading.Lock]) -> bool:
+        """Cria o venv, resolve as tags, seleciona os artefatos e instala-os."""
+        try:
+            inicio = time.perf_counter()
+            if not criar_ambiente_virtual(self.venv_path, self.interpretador):
+                raise RuntimeError("falha ao criar o ambiente virtual")
+            self.python_path = ativar_ambiente_virtual(self.venv_path)[0]
+            self._etapa("venv", inicio)
+            
+            inicio = time.perf_counter()
+            resultado = subprocess.run([self.python_path, "-c", SCRIPT_TAGS], check=True, capture_output=True, text=True)
+            info = json.loads(resultado.stdout)
+            self.versao = f"{info['implementacao']} {info['versao']}"
+            prioridade_tags = {tag: posicao for posicao, tag in enumerate(info["tags"])}
+            self._etapa("tags", inicio)
+            print_info(f"[{self.rotulo}] {self.versao}: {len(prioridade_tags)} tags suportadas")
+            
+            inicio = time.perf_counter()
+            selecionados = []
+            for pacote in pacotes:
+                artefato = escolher_artefato(localizar_artefatos(pasta_requirements, pacote), prioridade_tags)
+                if artefato is None and disjuntor.disponivel():
+                    artefato = self._baixar_compativel(pacote, pasta_requirements, prioridade_tags, travas_download)
+                if artefato is None:
+                    self.faltantes.append(pacote)
+                else:
+                    selecionados.append(artefato)
+            self._etapa("selecao", inicio)
+            if self.faltantes:
+                print_warning(f"[{self.rotulo}] Sem artefato compatível para: {', '.join(self.faltantes)}")
+            
+            inicio = time.perf_counter()
+            if selecionados:
+                print_info(f"[{self.rotulo}] Instalando {len(selecionados)} pacotes...")
+                # Uma única chamada ao pip: o resolvedor roda uma vez por ambiente
+                resultado = subprocess.run(
+                    [self.python_path, "-m", "pip", "install", "--no-index", "--find-links", str(pasta_requirements.absolute())]
+                    + [str(arquivo.absolute()) for arquivo in selecionados],
+                    capture_output=True, text=True,
+                )
+                if resultado.returncode != 0:
+                    logger.error(f"[{self.rotulo}] pip install falhou:\n{resultado.stdout}\n{resultado.stderr}")
+                    raise RuntimeError(f"pip install falhou (código {resultado.returncode})")
+                registrar_uso(pasta_requirements, selecionados)
+                self.instalados = len(selecionados)
+            self._etapa("instalacao", inicio)
+            print_success(f"[{self.rotulo}] ✓ Ambiente pronto em {sum(self.tempos.values()):.1f}s")
+            return not self.faltantes
+        except (subprocess.CalledProcessError, OSError, ValueError, RuntimeError) as e:
+            self.erro = str(e)
+            print_error(f"[{self.rotulo}] ✗ {e}")
+            return False
+
+    def _baixar_compativel(self, pacote: str, pasta_requirements: Path, prioridade_tags: Dict[str, int],
+                           travas_download: Dict[str, threading.Lock]) -> Path:
+        """Baixa, com o pip do próprio venv, o artefato compatível com este interpretador."""
+        # Ambientes diferentes podem precisar do mesmo arquivo (ex.: py3-none-any): um download por vez por pacote
+        with travas_download[nome_requisito(pacote)]:
+            artefato = escolher_artefato(localizar_artefatos(pasta_requirements, pacote), prioridade_tags)
+            if artefato:
+                return artefato
+            print_info(f"[{self.rotulo}] Baixando {pacote} para {self.versao}...", pacote=nome_requisito(pacote), fase="download")
+            resultado = subprocess.run(
+                [self.python_path, "-m", "pip", "download", "--no-deps", "--dest", str(pasta_requirements.absolute()), pacote],
+                capture_output=True, text=True,
+            )
+            if resultado.returncode != 0:
+                logger.error(f"[{self.rotulo}] pip download de {pacote} falhou:\n{resultado.stderr}")
+                return None
+            arquivos = localizar_artefatos(pasta_requirements, pacote)
+            registrar_uso(pasta_requirements, arquivos)
+            return escolher_artefato(arquivos, prioridade_tags)
+
+def rotulo_interpretador(interpretador: str) -> str:
+    """Gera o rótulo do venv de um interpretador (ex.: 'cp311' para CPython 3.11)."""
+    resultado = subprocess.run(
+        [interpretador, "-c", "import sys; print(sys.implementation.name, *sys.version_info[:2])"],
+        check=True, capture_output=True, text=True, timeout=30,
+    )
+    implementacao, major, minor = resultado.stdout.split()
+    prefixo = {"cpython": "cp", "pypy": "pp"}.get(implementacao, implementacao)
+    return f"{prefixo}{major}{minor}"
+
+def executar_matriz(interpretadores: List[str], pacotes: List[str], pasta_requirements: Path) -> bool:
+    """Cria e popula um venv por interpretador, todos em paralelo, a partir da mesma pasta requirements."""
+    script_dir = get_script_dir()
+    ambientes: List[AmbienteMatriz] = []
+    rotulos: Set[str] = set()
+    for interpretador in interpretadores:
+        try:
+            rotulo = rotulo_interpretador(interpretador)
+        except (subprocess.SubprocessError, OSError, ValueError) as e:
+            print_error(f"Interpretador inválido {interpretador}: {e}")
+            return False
+        # Dois interpretadores da mesma versão (ex.: sistema e pyenv) recebem rótulos distintos
+        base, sufixo = rotulo, 2
+        while rotulo in rotulos:
+            rotulo, sufixo = f"{base}-{sufixo}", sufixo + 1
+        rotulos.add(rotulo)
+        ambientes.append(AmbienteMatriz(interpretador, script_dir / f"venv-{rotulo}"))
+    
+    pasta_requirements.mkdir(exist_ok=True)
+    travas_download = {nome_requisito(pacote): threading.Lock() for pacote in pacotes}
+    print_highlight(f"\nCriando {len(ambientes)} ambientes em paralelo: {', '.join(a.rotulo for a in ambientes)}")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(ambientes)) as pool:
+        resultados = list(pool.map(lambda ambiente: ambiente.executar(pacotes, pasta_requirements, travas_download), ambientes))
+    duracao = time.perf_counter() - inicio
+    
+    print_highlight("\nResumo da matriz:")
+    print(f"{Fore.CYAN}  {'ambiente':<14} {'versão':<14} {'venv':>7} {'tags':>7} {'seleção':>8} {'instal.':>8} {'pacotes':>8}  status")
+    for ambiente, sucesso in zip(ambientes, resultados):
+        tempos = [f"{ambiente.tempos[etapa]:.1f}s" if etapa in ambiente.tempos else "-" for etapa in ("venv", "tags", "selecao", "instalacao")]
+        status = "ok" if sucesso else (ambiente.erro or f"{len(ambiente.faltantes)} faltando")
+        cor = Fore.GREEN if sucesso else Fore.RED
+        print(f"{cor}  {ambiente.rotulo:<14} {ambiente.versao or '?':<14} {tempos[0]:>7} {tempos[1]:>7} {tempos[2]:>8} {tempos[3]:>8} {ambiente.instalados:>8}  {status}")
+    print_info(f"Tempo total: {duracao:.1f}s (soma dos ambientes: {sum(sum(a.tempos.values()) for a in ambientes):.1f}s)")
+    return all(resultados)
+
+# Coleta de lixo do wheelhouse (orçamento de bytes + LRU)
+VARIAVEL_ORCAMENTO = "HERMES_WHEELHOUSE_ORCAMENTO"  # ex.: "5G"; ativa a coleta automática
+
+def converter_tamanho(texto: str) -> int:
+    """Converte um tamanho como '500M', '2G' ou '1048576' em bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', texto, flags=re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamanho inválido: {texto}")
+    multiplicador = 1024 ** " KMGT".index(match.group(2).upper() or " ")
+    return int(float(match.group(1)) * multiplicador)
+
+def versao_artefato(nome_arquivo: str) -> str:
+    """Extrai a versão do nome de um wheel ou sdist."""
+    return dividir_nome_artefato(nome_arquivo)[1]
+
+def ler_pinos(arquivo: Path) -> Set[Tuple[str, str]]:
+    """Lê os pacotes fixados (nome==versão) de um requirements.txt ou lockfile no mesmo formato.
+
+    Linhas de continuação, opções (--hash, -r...) e marcadores de ambiente são ignorados.
+    """
+    pinos = set()
+    if not arquivo.exists():
+        return pinos
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        conteudo = f.read().replace('\\\n', ' ')
+    for linha in conteudo.splitlines():
+        linha = linha.split('#')[0].split(';')[0].strip()
+        if not linha or linha.startswith('-'):
+            continue
+        match = re.match(r'([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*===?\s*([^\s,]+)', linha)
+        if match:
+            pinos.add((normalizar_nome(match.group(1)), match.group(2)))
+    return pinos
+
+def coletar_lixo(pasta_requirements: Path, orcamento: int, arquivos_pinos: List[Path],
+                 simular: bool = False) -> Dict:
+    """Remove artefatos não fixados, do menos para o mais recentemente usado, até caber no orçamento.
+
+    Artefatos referenciados pelo requirements.txt ou lockfile nunca são removidos.
+    Retorna um relatório com as decisões tomadas.
+    """
+    manifesto = atualizar_manifesto(pasta_requirements)
+    pinos: Set[Tuple[str, str]] = set()
+    for arquivo in arquivos_pinos:
+        pinos |= ler_pinos(arquivo)
+    
+    arquivos = manifesto["arquivos"]
+    total = sum(entrada["tamanho"] for entrada in arquivos.values())
+    fixados = {
+        nome for nome, entrada in arquivos.items()
+        if (entrada["projeto"], versao_artefato(nome)) in pinos
+    }
+    # LRU: artefatos nunca registrados usam a data de modificação como último uso
+    candidatos = sorted(
+        (nome for nome in arquivos if nome not in fixados),
+        key=lambda nome: (arquivos[nome].get("ultimo_uso", arquivos[nome]["mtime"]), nome),
+    )
+    
+    removidos = []
+    for nome in candidatos:
+        if total <= orcamento:
+            break
+        entrada = arquivos[nome]
+        if not simular:
+            try:
+                (pasta_requirements / nome).unlink()
+            except OSError as e:
+                logger.error(f"Erro ao remover {nome}: {e}")
+                continue
+        total -= entrada["tamanho"]
+        removidos.append({
+            "arquivo": nome,
+            "tamanho": entrada["tamanho"],
+            "ultimo_uso": datetime.fromtimestamp(entrada.get("ultimo_uso", entrada["mtime"])).isoformat(timespec="seconds"),
+        })
+        logger.debug(f"GC: {'removeria' if simular else 'removido'} {nome}", extra={"pacote": entrada["projeto"], "fase": "gc"})
+    
+    if removidos and not simular:
+        atualizar_manifesto(pasta_requirements)
+    return {
+        "orcamento": orcamento,
+        "tamanho_final": total,
+        "fixados": sorted(fixados),
+        "removidos": removidos,
+        "dentro_orcamento": total <= orcamento,
+        "simulado": simular,
+    }
+
+def exibir_relatorio_gc(relatorio: Dict):
+    """Exibe as decisões da coleta de lixo."""
+    acao = "Seriam removidos" if relatorio["simulado"] else "Removidos"
+    for item in relatorio["removidos"]:
+        print_info(f"  - {item['arquivo']} ({formatar_bytes(item['tamanho'])}, último uso {item['ultimo_uso']})")
+    liberado = sum(item["tamanho"] for item in relatorio["removidos"])
+    print_info(f"{acao}: {len(relatorio['removidos'])} arquivo(s), {formatar_bytes(liberado)} | "
+               f"fixados: {len(relatorio['fixados'])} | "
+               f"tamanho final: {formatar_bytes(relatorio['tamanho_final'])} de {formatar_bytes(relatorio['orcamento'])}")
+    if not relatorio["dentro_orcamento"]:
+        print_warning("Os pacotes fixados pelo requirements.txt/lockfile excedem o orçamento configurado.")
+
+def coleta_automatica(pasta_requirements: Path):
+    """Executa a coleta de lixo se um orçamento estiver configurado na variável de ambiente."""
+    valor = os.environ.get(VARIAVEL_ORCAMENTO)
+    if not valor or not pasta_requirements.exists():
+        return
+    try:
+        orcamento = converter_tamanho(valor)
+    except ValueError as e:
+        print_warning(f"{VARIAVEL_ORCAMENTO} ignorada: {e}")
+        return
+    relatorio = coletar_lixo(pasta_requirements, orcamento, [get_script_dir() / "requirements.txt"])
+    if relatorio["removidos"] or not relatorio["dentro_orcamento"]:
+        print_highlight("\nColeta automática da pasta requirements:")
+        exibir_relatorio_gc(relatorio)
+
+# Índice de pacotes local (PEP 503/691)
+TIPO_SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+TIPO_SIMPLE_HTML = "application/vnd.pypi.simple.v1+html"
+USO_INTERVALO_SERVE = 300  # s; evita regravar o manifesto a cada download do mesmo arquivo
+RECARGA_INTERVALO = 1.0  # s entre verificações de alterações na pasta requirements pelo serve
+# Preferência do servidor em empates: por tipo exato (PEP 691) e por curinga (compatível com pip antigo)
+PREFERENCIA_EXATA = (TIPO_SIMPLE_JSON, TIPO_SIMPLE_HTML, "text/html")
+PREFERENCIA_CURINGA = ("text/html", TIPO_SIMPLE_JSON, TIPO_SIMPLE_HTML)
+
+def negociar_formato(aceita: str) -> Optional[str]:
+    """Escolhe o Content-Type da página do índice a partir do cabeçalho Accept.
+
+    Respeita os valores q e os curingas (tipo/* e */*): para cada formato vale o
+    intervalo mais específico que o cobre. Sem Accept, responde text/html.
+    Retorna None se o cliente recusou todos os formatos (q=0).
+    """
+    intervalos = []
+    for item in (aceita or "*/*").split(","):
+        partes = [parte.strip() for parte in item.split(";")]
+        tipo = partes[0].lower()
+        if "/" not in tipo:
+            continue
+        q = 1.0
+        for parametro in partes[1:]:
+            chave, _, valor = parametro.partition("=")
+            if chave.strip().lower() == "q":
+                try:
+                    q = min(max(float(valor), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        intervalos.append((tipo, q))
+    
+    melhor = None
+    for candidato in PREFERENCIA_EXATA:
+        principal = candidato.split("/")[0]
+        especificidade, q = -1, 0.0
+        for tipo, q_intervalo in intervalos:
+            if tipo == candidato:
+                nivel = 2
+            elif tipo == f"{principal}/*":
+                nivel = 1
+            elif tipo == "*/*":
+                nivel = 0
+            else:
+                continue
+            if nivel > especificidade:
+                especificidade, q = nivel, q_intervalo
+        if q <= 0:
+            continue
+        preferencia = PREFERENCIA_EXATA if especificidade == 2 else PREFERENCIA_CURINGA
+        chave = (q, especificidade, -preferencia.index(candidato))
+        if melhor is None or chave > melhor[0]:
+            melhor = (chave, candidato)
+    return melhor[1] if melhor else None
+
+def _ler_links_html(pagina: str) -> List[Dict]:
+    """Extrai os arquivos de uma página de projeto HTML (PEP 503) no mesmo formato da API JSON."""
+    itens = []
+    for atributos, texto in re.findall(r'<a\s+([^>]*)>([^<]*)</a>', pagina, flags=re.IGNORECASE):
+        attrs = {chave.lower(): html.unescape(valor) for chave, valor in re.findall(r'([\w-]+)="([^"]*)"', atributos)}
+        if "href" not in attrs:
+            continue
+        url, _, fragmento = attrs["href"].partition("#")
+        hashes = {}
+        if fragmento.startswith("sha256="):
+            hashes["sha256"] = fragmento[len("sha256="):]
+        itens.append({
+            "filename": html.unescape(texto).strip(),
+            "url": url,
+            "hashes": hashes,
+            "requires-python": attrs.get("data-requires-python"),
+        })
+    return itens
+
+class IndiceWheelhouse:
+    """Índice simples gerado a partir do manifesto do wheelhouse.
+
+    As páginas são montadas a partir do manifesto em memória e mantidas em cache.
+    O índice é recarregado quando a pasta ou o manifesto mudam (arquivos copiados,
+    baixados por install/matrix ou registrados por outro processo), verificados no
+    máximo uma vez por RECARGA_INTERVALO.
+    """
+
+    def __init__(self, pasta_requirements: Path, upstream: str = None):
+        self.pasta = pasta_requirements
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self._trava = threading.Lock()
+        self._travas_download: Dict[str, threading.Lock] = {}
+        self._projetos: Dict[str, Dict[str, Dict]] = {}
+        self._upstream_projetos: Dict[str, Dict[str, Dict]] = {}
+        self._paginas: Dict[Tuple[str, str], bytes] = {}
+        self._ultimo_uso_registrado: Dict[str, float] = {}
+        self._assinatura_carregada = None
+        self._proxima_verificacao = 0.0
+        self._sessao = criar_sessao_requests() if self.upstream else None
+        self.recarregar()
+
+    def _assinatura(self) -> Tuple[int, int]:
+        """mtime da pasta (arquivos adicionados ou removidos) e do manifesto (registros de outros processos)."""
+        assinatura = []
+        for caminho in (self.pasta, self.pasta / MANIFESTO_ARQUIVO):
+            try:
+                assinatura.append(caminho.stat().st_mtime_ns)
+            except OSError:
+                assinatura.append(0)
+        return tuple(assinatura)
+
+    def recarregar(self):
+        """Reconstrói o índice em memória a partir do manifesto."""
+        manifesto = atualizar_manifesto(self.pasta)
+        assinatura = self._assinatura()
+        # Alterações no mesmo tick do relógio do sistema de arquivos não mudariam o mtime:
+        # um estado muito recente é verificado de novo na próxima consulta
+        if time.time_ns() - max(assinatura) < 2 * 10 ** 9:
+            assinatura = None
+        projetos: Dict[str, Dict[str, Dict]] = {}
+        for nome_arquivo, entrada in manifesto["arquivos"].items():
+            projetos.setdefault(entrada["projeto"], {})[nome_arquivo] = entrada
+        with self._trava:
+            self._projetos = projetos
+            self._paginas = {}
+            self._assinatura_carregada = assinatura
+        logger.debug(f"Índice carregado: {len(projetos)} projetos, {len(manifesto['arquivos'])} arquivos")
+
+    def _recarregar_se_alterado(self):
+        agora = time.monotonic()
+        with self._trava:
+            if agora < self._proxima_verificacao:
+                return
+            self._proxima_verificacao = agora + RECARGA_INTERVALO
+            carregada = self._assinatura_carregada
+        if carregada is None or self._assinatura() != carregada:
+            self.recarregar()
+
+    def _arquivos_upstream(self, projeto: str) -> Dict[str, Dict]:
+        """Consulta (uma vez) a página JSON do projeto no upstream."""
+        with self._trava:
+            if projeto in self._upstream_projetos:
+                return self._upstream_projetos[projeto]
+        arquivos = {}
+        url_projeto = f"{self.upstream}/{projeto}/"
+        try:
+            response = self._sessao.get(
+                url_projeto,
+                headers={"Accept": f"{TIPO_SIMPLE_JSON}, {TIPO_SIMPLE_HTML};q=0.1, text/html;q=0.01"},
+                timeout=10,
+            )
+            if response.status_code == 200:
+                if response.headers.get("Content-Type", "").startswith(TIPO_SIMPLE_JSON):
+                    itens = response.json().get("files", [])
+                else:
+                    itens = _ler_links_html(response.text)
+                for info in itens:
+                    arquivos[info["filename"]] = {
+                        "projeto": projeto,
+                        "sha256": info.get("hashes", {}).get("sha256"),
+                        "requires_python": info.get("requires-python"),
+                        "url": urljoin(url_projeto, info["url"]),
+                    }
+            elif response.status_code != 404:
+                logger.error(f"Upstream retornou {response.status_code} para {url_projeto}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Erro ao consultar upstream para {projeto}: {e}")
+            return {}
+        with self._trava:
+            self._upstream_projetos[projeto] = arquivos
+        return arquivos
+
+    def projetos(self) -> List[str]:
+        """Lista os projetos disponíveis localmente."""
+        self._recarregar_se_alterado()
+        with self._trava:
+            return sorted(self._projetos)
+
+    def arquivos(self, projeto: str) -> Dict[str, Dict]:
+        """Arquivos de um projeto: os locais têm precedência sobre os do upstream."""
+        self._recarregar_se_alterado()
+        with self._trava:
+            locais = dict(self._projetos.get(projeto, {}))
+        if self.upstream:
+            combinados = dict(self._arquivos_upstream(projeto))
+            combinados.update(locais)
+            return combinados
+        return locais
+
+    def pagina_projetos(self, formato: str) -> bytes:
+        """Página raiz (/simple/) com a lista de projetos."""
+        self._recarregar_se_alterado()
+        return self._pagina_cache(("", formato), lambda: self._renderizar_raiz(formato))
+
+    def pagina_projeto(self, projeto: str, formato: str) -> bytes:
+        """Página de um projeto (/simple/<projeto>/) ou None se não existir."""
+        arquivos = self.arquivos(projeto)
+        if not arquivos:
+            return None
+        return self._pagina_cache((projeto, formato), lambda: self._renderizar_projeto(projeto, arquivos, formato))
+
+    def _pagina_cache(self, chave: Tuple[str, str], renderizar) -> bytes:
+        with self._trava:
+            pagina = self._paginas.get(chave)
+        if pagina is None:
+            pagina = renderizar()
+            with self._trava:
+                self._paginas[chave] = pagina
+        return pagina
+
+    def _renderizar_raiz(self, formato: str) -> bytes:
+        projetos = self.projetos()
+        if formato == TIPO_SIMPLE_JSON:
+            return json.dumps({
+                "meta": {"api-version": "1.0"},
+                "projects": [{"name": projeto} for projeto in projetos],
+            }).encode('utf-8')
+        links = "\n".join(f'<a href="/simple/{projeto}/">{projeto}</a><br/>' for projeto in projetos)
+        return (
+            '<!DOCTYPE html>\n<html><head><meta name="pypi:repository-version" content="1.0">'
+            f'<title>Simple index</title></head><body>\n{links}\n</body></html>\n'
+        ).encode('utf-8')
+
+    def _renderizar_projeto(self, projeto: str, arquivos: Dict[str, Dict], formato: str) -> bytes:
+        nomes = sorted(arquivos)
+        if formato == TIPO_SIMPLE_JSON:
+            itens = []
+            for nome_arquivo in nomes:
+                entrada = arquivos[nome_arquivo]
+                item = {
+                    "filename": nome_arquivo,
+                    "url": f"/files/{quote(nome_arquivo)}",
+                    "hashes": {"sha256": entrada["sha256"]} if entrada.get("sha256") else {},
+                }
+                if entrada.get("requires_python"):
+                    item["requires-python"] = entrada["requires_python"]
+                itens.append(item)
+            return json.dumps({"meta": {"api-version": "1.0"}, "name": projeto, "files": itens}).encode('utf-8')
+        links = []
+        for nome_arquivo in nomes:
+            entrada = arquivos[nome_arquivo]
+            href = f"/files/{quote(nome_arquivo)}"
+            if entrada.get("sha256"):
+                href += f"#sha256={entrada['sha256']}"
+            atributos = ""
+            if entrada.get("requires_python"):
+                atributos = f' data-requires-python="{html.escape(entrada["requires_python"])}"'
+            links.append(f'<a href="{href}"{atributos}>{html.escape(nome_arquivo)}</a><br/>')
+        return (
+            '<!DOCTYPE html>\n<html><head><meta name="pypi:repository-version" content="1.0">'
+            f'<title>Links for {projeto}</title></head><body>\n<h1>Links for {projeto}</h1>\n'
+            + "\n".join(links) + '\n</body></html>\n'
+        ).encode('utf-8')
+
+    def registrar_servido(self, arquivo: Path):
+        """Registra o uso de um arquivo servido (para a coleta LRU), no máximo uma vez por USO_INTERVALO_SERVE."""
+        agora = time.monotonic()
+        with self._trava:
+            ultimo = self._ultimo_uso_registrado.get(arquivo.name)
+            if ultimo is not None and agora - ultimo < USO_INTERVALO_SERVE:
+                return
+            self._ultimo_uso_registrado[arquivo.name] = agora
+        try:
+            registrar_uso(self.pasta, [arquivo])
+        except OSError as e:
+            logger.error(f"Erro ao registrar o uso de {arquivo.name} no manifesto: {e}")
+
+    def obter_arquivo(self, nome_arquivo: str) -> Path:
+        """Retorna o caminho local de um artefato, buscando-o no upstream se necessário.
+
+        Retorna None se o arquivo não existir localmente nem no upstream.
+        """
+        caminho = self.pasta / nome_arquivo
+        if caminho.is_file():
+            return caminho
+        if not self.upstream:
+            return None
+        projeto = nome_projeto_artefato(nome_arquivo)
+        entrada = self._arquivos_upstream(projeto).get(nome_arquivo)
+        if not entrada:
+            return None
+        with self._trava:
+            trava_download = self._travas_download.setdefault(nome_arquivo, threading.Lock())
+        with trava_download:
+            # Outro cliente pode ter concluído o download enquanto aguardávamos
+            if caminho.is_file():
+                return caminho
+            return self._baixar_upstream(nome_arquivo, entrada)
+
+    def _baixar_upstream(self, nome_arquivo: str, entrada: Dict) -> Path:
+        caminho = self.pasta / nome_arquivo
+        parcial = caminho.with_name(nome_arquivo + ".part")
+        print_info(f"Buscando {nome_arquivo} no upstream...", pacote=entrada["projeto"], fase="cache")
+        try:
+            with medir_fase("cache", entrada["projeto"]):
+                h = hashlib.sha256()
+                with self._sessao.get(entrada["url"], stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    gravar_stream(response, parcial, hasher=h, mostrar_progresso=False)
+            if entrada.get("sha256") and h.hexdigest() != entrada["sha256"]:
+                raise ValueError(f"sha256 divergente para {nome_arquivo}")
+            os.replace(parcial, caminho)
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            print_error(f"Erro ao buscar {nome_arquivo} no upstream: {e}", pacote=entrada["projeto"], fase="cache")
+            if parcial.exists():
+                parcial.unlink()
+            return None
+        registro = registrar_artefato(self.pasta, caminho)
+        with self._trava:
+            self._projetos.setdefault(registro["projeto"], {})[nome_arquivo] = registro
+            self._paginas = {chave: pagina for chave, pagina in self._paginas.items() if chave[0] not in ("", registro["projeto"])}
+        print_success(f"{nome_arquivo} armazenado em requirements/", pacote=entrada["projeto"], fase="cache")
+        return caminho
+
+class ManipuladorIndice(BaseHTTPRequestHandler):
+    """Manipulador HTTP/1.1 (keep-alive) do índice local."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "HermesIndex/1.0"
+    indice: IndiceWheelhouse = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self):
+        self._responder(enviar_corpo=True)
+
+    def do_HEAD(self):
+        self._responder(enviar_corpo=False)
+
+    def _formato(self) -> Optional[str]:
+        tipo = negociar_formato(self.headers.get("Accept", ""))
+        if tipo is None:
+            self.send_error(406, "Formatos aceitos: JSON ou HTML do índice simple")
+        return tipo
+
+    def _redirecionar(self, destino: str):
+        self.send_response(301)
+        self.send_header("Location", destino)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _enviar_bytes(self, corpo: bytes, tipo: str, enviar_corpo: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.send_header("Vary", "Accept")
+        self.end_headers()
+        if enviar_corpo:
+            self.wfile.write(corpo)
+
+    def _responder(self, enviar_corpo: bool):
+        caminho = unquote(urlsplit(self.path).path)
+        if caminho in ("/", "/simple"):
+            self._redirecionar("/simple/")
+        elif caminho == "/simple/":
+            tipo = self._formato()
+            if tipo is None:
+                return
+            formato = TIPO_SIMPLE_JSON if tipo == TIPO_SIMPLE_JSON else TIPO_SIMPLE_HTML
+            self._enviar_bytes(self.indice.pagina_projetos(formato), tipo, enviar_corpo)
+        elif caminho.startswith("/simple/"):
+            nome = caminho[len("/simple/"):].strip("/")
+            projeto = normalizar_nome(nome)
+            if nome != projeto or not caminho.endswith("/"):
+                self._redirecionar(f"/simple/{projeto}/")
+                return
+            tipo = self._formato()
+            if tipo is None:
+                return
+            # text/html e a variante v1+html têm o mesmo corpo; só o Content-Type muda
+            formato = TIPO_SIMPLE_JSON if tipo == TIPO_SIMPLE_JSON else TIPO_SIMPLE_HTML
+            pagina = self.indice.pagina_projeto(projeto, formato)
+            if pagina is None:
+                self.send_error(404, f"Projeto {projeto} não encontrado")
+                return
+            self._enviar_bytes(pagina, tipo, enviar_corpo)
+        elif caminho.startswith("/files/"):
+            self._enviar_arquivo(caminho[len("/files/"):], enviar_corpo)
+        else:
+            self.send_error(404)
+
+    def _intervalo(self, tamanho: int) -> Tuple[int, int]:
+        """Interpreta o cabeçalho Range (um único intervalo de bytes).
+
+        Retorna (inicio, fim) inclusivo, None se não houver Range válido a aplicar
+        ou (-1, -1) se o intervalo não for satisfazível.
+        """
+        cabecalho = self.headers.get("Range")
+        if not cabecalho:
+            return None
+        match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", cabecalho)
+        if not match or (not match.group(1) and not match.group(2)):
+            return None
+        if not match.group(1):
+            sufixo = int(match.group(2))
+            if sufixo == 0:
+                return (-1, -1)
+            return (max(tamanho - sufixo, 0), tamanho - 1)
+        inicio = int(match.group(1))
+        fim = int(match.group(2)) if match.group(2) else tamanho - 1
+        if inicio >= tamanho or fim < inicio:
+            return (-1, -1)
+        return (inicio, min(fim, tamanho - 1))
+
+    def _enviar_arquivo(self, nome_arquivo: str, enviar_corpo: bool):
+        if not nome_arquivo or "/" in nome_arquivo or "\\" in nome_arquivo or nome_arquivo.startswith("."):
+            self.send_error(404)
+            return
+        if not extensao_artefato(nome_arquivo):
+            self.send_error(404)
+            return
+        arquivo = self.indice.obter_arquivo(nome_arquivo)
+        if arquivo is None:
+            self.send_error(404, f"Arquivo {nome_arquivo} não encontrado")
+            return
+        tamanho = arquivo.stat().st_size
+        intervalo = self._intervalo(tamanho)
+        if intervalo == (-1, -1):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{tamanho}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        inicio, fim = intervalo if intervalo else (0, tamanho - 1)
+        quantidade = fim - inicio + 1 if tamanho else 0
+        self.send_response(206 if intervalo else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(quantidade))
+        if intervalo:
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{tamanho}")
+        self.end_headers()
+        if enviar_corpo and quantidade:
+            with open(arquivo, 'rb') as f:
+                self.connection.sendfile(f, offset=inicio, count=quantidade)
+            # Arquivos servidos a outras máquinas também contam como uso (ranges só no primeiro trecho)
+            if inicio == 0:
+                self.indice.registrar_servido(arquivo)
+
+def executar_servidor(pasta_requirements: Path, host: str, porta: int, upstream: str = None) -> int:
+    """Serve a pasta requirements como um índice de pacotes até ser interrompido."""
+    pasta_requirements.mkdir(exist_ok=True)
+    if upstream and disjuntor.offline:
+        print_warning("Modo offline: o upstream não será consultado.")
+        upstream = None
+    print_info("Carregando manifesto da pasta requirements...")
+    indice = IndiceWheelhouse(pasta_requirements, upstream)
+    manipulador = type("ManipuladorWheelhouse", (ManipuladorIndice,), {"indice": indice})
+    try:
+        servidor = ThreadingHTTPServer((host, porta), manipulador)
+    except OSError as e:
+        log_exception(e, f"Não foi possível abrir a porta {porta}")
+        return 1
+    servidor.daemon_threads = True
+    
+    endereco = host if host not in ("0.0.0.0", "") else socket.gethostname()
+    print_success(f"Índice disponível em http://{endereco}:{porta}/simple/ ({len(indice.projetos())} projetos)")
+    if upstream:
+        print_info(f"Pacotes ausentes serão buscados em {upstream} e armazenados em requirements/")
+    print_highlight(f"Uso: pip install --index-url http://{endereco}:{porta}/simple/ --trusted-host {endereco} <pacote>")
+    print_info("Pressione Ctrl+C para encerrar.")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print_info("\nEncerrando servidor...")
+    finally:
+        servidor.server_close()
+    return 0
+
 def exibir_menu_opcoes(pasta_requirements: Path, pacotes_requirements: List[str], pacotes_ambiente: List[str]):
     """Exibe menu de opções para o usuário."""
     print(f"\n{Fore.CYAN}╔═══════════════════════════════════════════════════════╗")
@@ -677,11 +2690,254 @@ def confirmar_acao(acao: str) -> bool:
     resposta = input().strip().upper()
     return resposta == 'S'
 
-def main():
+# Comandos que só trabalham com arquivos locais (dispensam a sonda de conectividade)
+COMANDOS_LOCAIS = {"gc", "check", "audit", "benchmark"}
+
+def analisar_argumentos(argv: List[str] = None) -> argparse.Namespace:
+    """Interpreta os argumentos de linha de comando. Sem comando, abre o menu interativo."""
+    parser = argparse.ArgumentParser(
+        prog="hermes_installer",
+        description="Hermes Installer - Instalador de Dependências Python",
+    )
+    parser.add_argument("--offline", action="store_true",
+                        help=f"Nunca acessa a rede: usa apenas a pasta requirements e os caches (ou {VARIAVEL_OFFLINE}=1)")
+    subparsers = parser.add_subparsers(dest="comando", metavar="comando")
+    
+    serve = subparsers.add_parser("serve", help="Serve a pasta requirements como índice de pacotes (PEP 503/691)")
+    serve.add_argument("--host", default="0.0.0.0", help="Endereço de escuta (padrão: 0.0.0.0)")
+    serve.add_argument("--porta", type=int, default=8080, help="Porta de escuta (padrão: 8080)")
+    serve.add_argument("--upstream", metavar="URL",
+                       help="Índice usado para buscar e armazenar pacotes ausentes (ex.: https://pypi.org/simple)")
+    
+    install = subparsers.add_parser("install", help="Baixa e instala pacotes em pipeline, seguindo o grafo de dependências")
+    install.add_argument("--origem", choices=["requirements", "ambiente"], default="requirements",
+                         help="Pacotes do requirements.txt ou do ambiente de desenvolvimento atual (padrão: requirements)")
+    install.add_argument("--dry-run", action="store_true", help="Apenas exibe o plano de execução com os bytes estimados")
+    install.add_argument("--downloads", type=int, default=DOWNLOADS_SIMULTANEOS,
+                         help=f"Downloads simultâneos (padrão: {DOWNLOADS_SIMULTANEOS})")
+    
+    gc = subparsers.add_parser("gc", help="Remove pacotes pouco usados da pasta requirements até caber no orçamento")
+    gc.add_argument("--orcamento", default=os.environ.get(VARIAVEL_ORCAMENTO),
+                    help=f"Tamanho máximo da pasta, ex.: 500M, 5G (padrão: variável {VARIAVEL_ORCAMENTO})")
+    gc.add_argument("--lockfile", action="append", default=[], metavar="ARQUIVO",
+                    help="Lockfile adicional cujos pacotes fixados nunca são removidos (pode repetir)")
+    gc.add_argument("--dry-run", action="store_true", help="Apenas exibe o que seria removido")
+    gc.add_argument("--json", action="store_true", help="Exibe o relatório em JSON")
+    
+    check = subparsers.add_parser("check", help="Verifica offline se a pasta requirements contém todas as dependências")
+    check.add_argument("--lockfile", action="append", default=[], metavar="ARQUIVO",
+                       help="Lockfile adicional com pacotes fixados a verificar (pode repetir)")
+    check.add_argument("--json", action="store_true", help="Exibe o relatório em JSON")
+    
+    audit = subparsers.add_parser("audit", help="Audita a integridade dos pacotes da pasta requirements (sha256 e RECORD)")
+    audit.add_argument("--profundo", action="store_true",
+                       help="Também descomprime cada wheel e confere os hashes do RECORD")
+    audit.add_argument("--workers", type=int, help="Threads de verificação (padrão: número de núcleos)")
+    audit.add_argument("--saida", metavar="ARQUIVO", help="Grava o relatório JSON neste arquivo")
+    audit.add_argument("--json", action="store_true", help="Exibe o relatório em JSON")
+    
+    matrix = subparsers.add_parser("matrix", help="Cria um venv por interpretador, em paralelo, a partir da pasta requirements")
+    matrix.add_argument("interpretadores", nargs="+", metavar="PYTHON",
+                        help="Caminhos dos interpretadores (ex.: /usr/bin/python3.9 /usr/bin/python3.11)")
+    matrix.add_argument("--origem", choices=["requirements", "ambiente"], default="requirements",
+                        help="Pacotes do requirements.txt ou do ambiente de desenvolvimento atual (padrão: requirements)")
+    
+    benchmark = subparsers.add_parser("benchmark", help="Mede a vazão (MB/s) do download contra um servidor local")
+    benchmark.add_argument("--tamanho", default="256M", help="Tamanho do arquivo de teste (padrão: 256M)")
+    benchmark.add_argument("--repeticoes", type=int, default=3, help="Downloads por método; vale o melhor (padrão: 3)")
+    
+    return parser.parse_args(argv)
+
+def executar_comando(args: argparse.Namespace, pasta_requirements: Path) -> int:
+    """Executa um comando não interativo e retorna o código de saída."""
+    if args.comando == "serve":
+        return executar_servidor(pasta_requirements, args.host, args.porta, args.upstream)
+    if args.comando == "install":
+        return executar_instalacao(args, pasta_requirements)
+    if args.comando == "gc":
+        return executar_gc(args, pasta_requirements)
+    if args.comando == "check":
+        return executar_verificacao(args, pasta_requirements)
+    if args.comando == "audit":
+        return executar_auditoria(args, pasta_requirements)
+    if args.comando == "matrix":
+        pacotes = obter_pacotes_ambiente_desenvolvimento() if args.origem == "ambiente" else ler_requirements()
+        return 0 if executar_matriz(args.interpretadores, pacotes, pasta_requirements) else 1
+    if args.comando == "benchmark":
+        return executar_benchmark(converter_tamanho(args.tamanho), max(1, args.repeticoes))
+    print_error(f"Comando desconhecido: {args.comando}")
+    return 2
+
+def executar_instalacao(args: argparse.Namespace, pasta_requirements: Path) -> int:
+    """Comando install: executa (ou apenas planeja) o pipeline de download e instalação."""
+    if args.origem == "ambiente":
+        pacotes = obter_pacotes_ambiente_desenvolvimento()
+    else:
+        try:
+            pacotes = ler_requirements()
+        except FileNotFoundError as e:
+            print_error(str(e))
+            return 1
+    if not pacotes:
+        print_error("Nenhum pacote para instalar!")
+        return 1
+    
+    executor = ExecutorPipeline(pacotes, pasta_requirements, downloads_simultaneos=max(1, args.downloads))
+    if args.dry_run:
+        executor.exibir_plano()
+        return 0
+    
+    if not criar_ambiente_virtual():
+        print_error("Falha ao criar ambiente virtual. Verifique o log para mais detalhes.")
+        return 1
+    executor.pip_path = ativar_ambiente_virtual()[1]
+    if not atualizar_pip(executor.pip_path, pasta_requirements):
+        return 1
+    sucesso = executor.executar()
+    coleta_automatica(pasta_requirements)
+    return 0 if sucesso else 1
+
+def executar_gc(args: argparse.Namespace, pasta_requirements: Path) -> int:
+    """Comando gc: coleta de lixo da pasta requirements."""
+    if not args.orcamento:
+        print_error(f"Informe o orçamento com --orcamento ou pela variável {VARIAVEL_ORCAMENTO}.")
+        return 2
     try:
-        # Exibe o logo
-        exibir_logo()
-        print_highlight("\n=== Hermes Installer ===")
+        orcamento = converter_tamanho(args.orcamento)
+    except ValueError as e:
+        print_error(str(e))
+        return 2
+    if not pasta_requirements.exists():
+        print_warning("Pasta requirements não encontrada, nada a fazer.")
+        return 0
+    arquivos_pinos = [get_script_dir() / "requirements.txt"] + [Path(arquivo) for arquivo in args.lockfile]
+    relatorio = coletar_lixo(pasta_requirements, orcamento, arquivos_pinos, simular=args.dry_run)
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    else:
+        exibir_relatorio_gc(relatorio)
+    return 0
+
+def executar_verificacao(args: argparse.Namespace, pasta_requirements: Path) -> int:
+    """Comando check: verifica a completude da pasta requirements sem acessar a rede."""
+    if not pasta_requirements.exists():
+        print_error("Pasta requirements não encontrada!")
+        return 1
+    arquivos_pinos = [get_script_dir() / "requirements.txt"] + [Path(arquivo) for arquivo in args.lockfile]
+    relatorio = verificar_wheelhouse(pasta_requirements, arquivos_pinos)
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return 0 if relatorio["completo"] else 1
+    
+    print_highlight(f"\nOrdem de instalação ({len(relatorio['ordem_instalacao'])} pacotes):")
+    for posicao, nome_arquivo in enumerate(relatorio["ordem_instalacao"], 1):
+        print(f"  {posicao:>3}. {nome_arquivo}")
+    for item in relatorio["faltantes"]:
+        print_error(f"✗ Faltando: {item['requisito']} (requerido por {item['requerido_por']})")
+    for item in relatorio["conflitos"]:
+        print_error(f"✗ Conflito: {item['requisito']} (requerido por {item['requerido_por']}), versão local {item['versao_local']}")
+    for nome_arquivo in relatorio["sem_metadados"]:
+        print_warning(f"Sem metadados (dependências não verificadas): {nome_arquivo}")
+    if relatorio["completo"]:
+        print_success(f"✓ Pasta requirements completa (verificada em {relatorio['duracao'] * 1000:.0f} ms)")
+        return 0
+    print_error(f"✗ Pasta requirements incompleta (verificada em {relatorio['duracao'] * 1000:.0f} ms)")
+    return 1
+
+def executar_auditoria(args: argparse.Namespace, pasta_requirements: Path) -> int:
+    """Comando audit: verificação de integridade da pasta requirements."""
+    if not pasta_requirements.exists():
+        print_error("Pasta requirements não encontrada!")
+        return 1
+    relatorio = auditar_wheelhouse(pasta_requirements, args.profundo, args.workers)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return 0 if relatorio["integro"] else 1
+    
+    for resultado in relatorio["arquivos"]:
+        if resultado["status"] != "ok":
+            print_error(f"✗ {resultado['arquivo']}: {resultado['status']}")
+            for problema in resultado["problemas"]:
+                print_warning(f"    {problema}")
+    resumo = ", ".join(f"{status}: {quantidade}" for status, quantidade in sorted(relatorio["resumo"].items()))
+    print_info(f"\n{len(relatorio['arquivos'])} arquivos, {formatar_bytes(relatorio['bytes'])} em {relatorio['duracao']:.2f}s "
+               f"({relatorio['mb_por_segundo']} MB/s, {relatorio['workers']} threads) | {resumo}")
+    if args.saida:
+        print_info(f"Relatório gravado em {args.saida}")
+    if relatorio["integro"]:
+        print_success("✓ Pasta requirements íntegra")
+        return 0
+    print_error("✗ Foram encontrados problemas de integridade")
+    return 1
+
+def executar_benchmark(tamanho: int, repeticoes: int) -> int:
+    """Comando benchmark: compara a vazão do gravador de downloads com a leitura em blocos de 1 KB.
+
+    O arquivo de teste é servido pelo mesmo servidor do comando serve, em localhost.
+    """
+    def baixar_blocos_1kb(response, destino: Path):
+        # Método anterior: iter_content de 1 KB e atualização da barra a cada bloco
+        with open(destino, 'wb') as f, tqdm(total=int(response.headers.get('content-length', 0)), disable=True) as barra:
+            for data in response.iter_content(chunk_size=1024):
+                barra.update(f.write(data))
+    
+    def baixar_stream(response, destino: Path):
+        gravar_stream(response, destino, mostrar_progresso=False)
+    
+    with tempfile.TemporaryDirectory(prefix="hermes-benchmark-") as temporario:
+        pasta = Path(temporario) / "requirements"
+        pasta.mkdir()
+        nome_arquivo = "hermes_benchmark-1.0-py3-none-any.whl"
+        print_info(f"Gerando arquivo de teste de {formatar_bytes(tamanho)}...")
+        with open(pasta / nome_arquivo, 'wb') as f:
+            bloco = os.urandom(1024 * 1024)
+            for _ in range(tamanho // len(bloco)):
+                f.write(bloco)
+            f.write(bloco[:tamanho % len(bloco)])
+        
+        manipulador = type("ManipuladorBenchmark", (ManipuladorIndice,), {"indice": IndiceWheelhouse(pasta)})
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), manipulador)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/files/{nome_arquivo}"
+        
+        session = requests.Session()
+        resultados = {}
+        try:
+            for metodo, baixar in (("blocos de 1 KB", baixar_blocos_1kb), ("gravar_stream", baixar_stream)):
+                melhor = None
+                for _ in range(repeticoes):
+                    destino = Path(temporario) / "download.bin"
+                    inicio = time.perf_counter()
+                    with session.get(url, stream=True) as response:
+                        response.raise_for_status()
+                        baixar(response, destino)
+                    duracao = time.perf_counter() - inicio
+                    if destino.stat().st_size != tamanho:
+                        print_error(f"{metodo}: tamanho baixado incorreto ({destino.stat().st_size} bytes)")
+                        return 1
+                    destino.unlink()
+                    melhor = duracao if melhor is None else min(melhor, duracao)
+                resultados[metodo] = tamanho / (1024 * 1024) / melhor
+                print_info(f"{metodo:<16} {resultados[metodo]:>9.1f} MB/s ({melhor:.2f}s)")
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+    
+    ganho = resultados["gravar_stream"] / resultados["blocos de 1 KB"]
+    print_success(f"gravar_stream: {ganho:.1f}x a vazão do método anterior")
+    return 0
+
+def main(argv: List[str] = None):
+    args = analisar_argumentos(argv)
+    try:
+        # Exibe o logo (exceto quando a saída é JSON)
+        if not getattr(args, "json", False):
+            exibir_logo()
+            print_highlight("\n=== Hermes Installer ===")
         logger.debug("Iniciando Hermes Installer")
         
         # Verifica a estrutura básica de pastas
@@ -691,6 +2947,24 @@ def main():
         
         # Obtém informações sobre o ambiente
         pasta_requirements = script_dir / "requirements"
+        
+        # Modo offline explícito; uma sonda sem resposta só abre o disjuntor do PyPI,
+        # que volta a ser tentado após DISJUNTOR_TEMPO_ABERTO segundos
+        saida_json = getattr(args, "json", False)
+        if args.offline:
+            disjuntor.offline = True
+        if disjuntor.offline:
+            if not saida_json:
+                print_info("Modo offline: nenhum acesso à rede será feito.")
+        elif args.comando not in COMANDOS_LOCAIS and not disjuntor.sondar():
+            disjuntor.registrar_falha(f"https://{SONDA_HOST}/", "sonda de conectividade sem resposta")
+            if not saida_json:
+                print_warning(f"Sem conexão com a internet: o PyPI não será consultado nos próximos {DISJUNTOR_TEMPO_ABERTO}s.")
+        
+        # Comandos não interativos (serve, ...)
+        if args.comando:
+            sys.exit(executar_comando(args, pasta_requirements))
+        
         pacotes_requirements = []
         pacotes_ambiente = obter_pacotes_ambiente_desenvolvimento()
         
@@ -737,31 +3011,8 @@ def main():
             sys.exit(1)
         
         # Atualiza o pip
-        print_info("Atualizando pip...")
-        try:
-            subprocess.run([pip_path, "install", "--upgrade", "pip"], check=True)
-            logger.debug("Pip atualizado com sucesso")
-        except Exception as e:
-            log_exception(e, "Erro ao atualizar pip pela internet")
-            # Tentar instalar pip localmente
-            print_warning("Não foi possível atualizar o pip pela internet. Tentando instalar versão local do pip...")
-            pip_local = None
-            for arquivo in pasta_requirements.iterdir():
-                if arquivo.is_file() and arquivo.name.startswith("pip-") and (arquivo.suffix == ".whl" or arquivo.suffixes == [".tar", ".gz"]):
-                    pip_local = str(arquivo)
-                    break
-            if pip_local:
-                try:
-                    subprocess.run([pip_path, "install", "--upgrade", pip_local], check=True)
-                    print_success("Pip instalado/atualizado localmente com sucesso!")
-                    logger.debug("Pip instalado/atualizado localmente com sucesso")
-                except Exception as e2:
-                    log_exception(e2, "Falha ao instalar pip localmente")
-                    print_error("Falha ao instalar o pip localmente. Verifique sua conexão ou o arquivo local.")
-                    sys.exit(1)
-            else:
-                print_error("Arquivo do pip não encontrado na pasta requirements. Não foi possível atualizar o pip.")
-                sys.exit(1)
+        if not atualizar_pip(pip_path, pasta_requirements):
+            sys.exit(1)
         
         # Executa a ação escolhida
         sucesso = None
@@ -779,12 +3030,7 @@ def main():
                 
                 if confirmar_acao("criar pasta requirements e baixar pacotes do requirements.txt"):
                     pasta_requirements.mkdir(exist_ok=True)
-                    print_info("Baixando pacotes do requirements.txt...")
-                    for pacote in pacotes_requirements:
-                        baixar_pacote(pacote, pasta_requirements)
-                    
-                    if confirmar_acao("instalar os pacotes baixados"):
-                        sucesso = instalar_pacotes(pip_path, pasta_requirements)
+                    sucesso = baixar_e_instalar(pacotes_requirements, pip_path, pasta_requirements)
         
         elif escolha == 2:
             # Atualizar pacotes existentes
@@ -803,15 +3049,10 @@ def main():
                 pasta_requirements.mkdir(exist_ok=True)
                 # Remove arquivos existentes
                 for arquivo in pasta_requirements.iterdir():
-                    if arquivo.is_file() and (arquivo.suffix == '.whl' or arquivo.suffixes == ['.tar', '.gz']):
+                    if eh_artefato(arquivo):
                         arquivo.unlink()
                 
-                print_info("Baixando pacotes do requirements.txt...")
-                for pacote in pacotes_requirements:
-                    baixar_pacote(pacote, pasta_requirements)
-                
-                if confirmar_acao("instalar os pacotes baixados"):
-                    sucesso = instalar_pacotes(pip_path, pasta_requirements)
+                sucesso = baixar_e_instalar(pacotes_requirements, pip_path, pasta_requirements)
         
         elif escolha == 4:
             # Baixar pacotes do ambiente de desenvolvimento (apenas baixar)
@@ -835,6 +3076,9 @@ def main():
                 pasta_requirements.mkdir(exist_ok=True)
                 sucesso = instalar_pacotes_ambiente_desenvolvimento(pip_path, pasta_requirements)
         
+        # Mantém a pasta requirements dentro do orçamento configurado
+        coleta_automatica(pasta_requirements)
+        
         # Resultado final
         if sucesso:
             print_success("\n✓ Download concluída com sucesso!")
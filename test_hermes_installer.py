@@ -0,0 +1,681 @@
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import hermes_installer as h
+
+
+def manipulador_com_range(valor):
+    manipulador = object.__new__(h.ManipuladorIndice)
+    manipulador.headers = {"Range": valor} if valor is not None else {}
+    return manipulador
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=1000-", (-1, -1)),
+    ("bytes=50-10", (-1, -1)),
+    ("bytes=-0", (-1, -1)),
+    ("bytes=-", None),
+    ("bytes=0-10,20-30", None),
+    ("items=0-10", None),
+])
+def test_intervalo(valor, esperado):
+    assert manipulador_com_range(valor)._intervalo(1000) == esperado
+
+
+@pytest.mark.parametrize("aceita, esperado", [
+    ("", "text/html"),
+    ("*/*", "text/html"),
+    ("text/html", "text/html"),
+    (h.TIPO_SIMPLE_HTML, h.TIPO_SIMPLE_HTML),
+    (h.TIPO_SIMPLE_JSON, h.TIPO_SIMPLE_JSON),
+    (f"{h.TIPO_SIMPLE_JSON}, {h.TIPO_SIMPLE_HTML};q=0.1, text/html;q=0.01", h.TIPO_SIMPLE_JSON),
+    (f"{h.TIPO_SIMPLE_JSON};q=0, text/html", "text/html"),
+    (f"{h.TIPO_SIMPLE_JSON};q=0.2, text/html;q=0.5", "text/html"),
+    ("application/*", h.TIPO_SIMPLE_JSON),
+    ("text/html;q=0", None),
+    ("image/png", None),
+])
+def test_negociar_formato(aceita, esperado):
+    assert h.negociar_formato(aceita) == esperado
+
+
+def test_eh_artefato_reconhece_sdists_gz(tmp_path):
+    for nome in ("foo-1.0-py3-none-any.whl", "foo-1.0.tar.gz", "foo-1.0.gz", "foo-1.0.zip", "manifest.json", "foo.whl.part"):
+        (tmp_path / nome).write_bytes(b"x")
+    reconhecidos = sorted(arquivo.name for arquivo in tmp_path.iterdir() if h.eh_artefato(arquivo))
+    assert reconhecidos == ["foo-1.0-py3-none-any.whl", "foo-1.0.gz", "foo-1.0.tar.gz", "foo-1.0.zip"]
+    assert h.versao_artefato("foo-1.0.gz") == "1.0"
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("1048576", 1048576),
+    ("500K", 500 * 1024),
+    ("2G", 2 * 1024 ** 3),
+    ("1.5M", int(1.5 * 1024 ** 2)),
+    ("3GiB", 3 * 1024 ** 3),
+    ("10mb", 10 * 1024 ** 2),
+])
+def test_converter_tamanho(texto, esperado):
+    assert h.converter_tamanho(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", ["", "abc", "5X", "-1G"])
+def test_converter_tamanho_invalido(texto):
+    with pytest.raises(ValueError):
+        h.converter_tamanho(texto)
+
+
+def test_ler_pinos(tmp_path):
+    arquivo = tmp_path / "requirements.txt"
+    arquivo.write_text(
+        "# comentário\n"
+        "Requests==2.31.0\n"
+        "charset_normalizer==3.3.2 \\\n"
+        "    --hash=sha256:abc\n"
+        "pywin32-ctypes==0.2.2 ; sys_platform == 'win32'\n"
+        "uvicorn[standard]===0.29.0\n"
+        "-r outro.txt\n"
+        "tqdm>=4\n",
+        encoding="utf-8",
+    )
+    assert h.ler_pinos(arquivo) == {
+        ("requests", "2.31.0"),
+        ("charset-normalizer", "3.3.2"),
+        ("pywin32-ctypes", "0.2.2"),
+        ("uvicorn", "0.29.0"),
+    }
+    assert h.ler_pinos(tmp_path / "inexistente.txt") == set()
+
+
+def criar_wheelhouse(pasta, arquivos):
+    """Cria artefatos de 100 bytes com o último uso informado (None = nunca registrado)."""
+    manifesto = h.carregar_manifesto(pasta)
+    for indice, (nome, ultimo_uso) in enumerate(arquivos):
+        caminho = pasta / nome
+        caminho.write_bytes(b"x" * 100)
+        os.utime(caminho, (1000 + indice, 1000 + indice))
+        entrada = h._entrada_manifesto(caminho, None)
+        if ultimo_uso is not None:
+            entrada["ultimo_uso"] = ultimo_uso
+        manifesto["arquivos"][nome] = entrada
+    h.salvar_manifesto(pasta, manifesto)
+
+
+def test_coletar_lixo_remove_menos_usados_primeiro(tmp_path):
+    pasta = tmp_path / "requirements"
+    pasta.mkdir()
+    criar_wheelhouse(pasta, [
+        ("antigo-1.0-py3-none-any.whl", None),      # mtime 1000, nunca usado
+        ("recente-1.0-py3-none-any.whl", 5000),
+        ("medio-1.0.tar.gz", 3000),
+        ("fixado-1.0-py3-none-any.whl", 1),         # o menos usado, mas fixado
+        ("velho-2.0.gz", 2000),
+    ])
+    pinos = tmp_path / "requirements.txt"
+    pinos.write_text("fixado==1.0\n", encoding="utf-8")
+
+    relatorio = h.coletar_lixo(pasta, 250, [pinos])
+
+    assert [item["arquivo"] for item in relatorio["removidos"]] == [
+        "antigo-1.0-py3-none-any.whl",
+        "velho-2.0.gz",
+        "medio-1.0.tar.gz",
+    ]
+    assert relatorio["fixados"] == ["fixado-1.0-py3-none-any.whl"]
+    assert relatorio["tamanho_final"] == 200
+    assert relatorio["dentro_orcamento"]
+    assert sorted(arquivo.name for arquivo in pasta.iterdir() if h.eh_artefato(arquivo)) == [
+        "fixado-1.0-py3-none-any.whl",
+        "recente-1.0-py3-none-any.whl",
+    ]
+    manifesto = json.loads((pasta / h.MANIFESTO_ARQUIVO).read_text(encoding="utf-8"))
+    assert sorted(manifesto["arquivos"]) == ["fixado-1.0-py3-none-any.whl", "recente-1.0-py3-none-any.whl"]
+
+
+def test_coletar_lixo_simulado_nao_remove(tmp_path):
+    pasta = tmp_path / "requirements"
+    pasta.mkdir()
+    criar_wheelhouse(pasta, [("a-1.0-py3-none-any.whl", 10), ("b-1.0-py3-none-any.whl", 20)])
+
+    relatorio = h.coletar_lixo(pasta, 100, [], simular=True)
+
+    assert [item["arquivo"] for item in relatorio["removidos"]] == ["a-1.0-py3-none-any.whl"]
+    assert (pasta / "a-1.0-py3-none-any.whl").exists()
+
+
+@pytest.mark.parametrize("nome_arquivo, projeto, versao", [
+    ("requests-2.31.0-py3-none-any.whl", "requests", "2.31.0"),
+    ("foo-1.0-1-py3-none-any.whl", "foo", "1.0"),
+    ("pywin32_ctypes-0.2.2-py3-none-any.whl", "pywin32-ctypes", "0.2.2"),
+    # Wheels gravados pelo Hermes como nome-versão.whl
+    ("requests-2.31.0.whl", "requests", "2.31.0"),
+    ("pywin32-ctypes-0.2.2.whl", "pywin32-ctypes", "0.2.2"),
+    ("pyinstaller-hooks-contrib-2025.2.tar.gz", "pyinstaller-hooks-contrib", "2025.2"),
+    ("pefile-2023.2.7.gz", "pefile", "2023.2.7"),
+])
+def test_nome_e_versao_artefato(nome_arquivo, projeto, versao):
+    assert h.nome_projeto_artefato(nome_arquivo) == projeto
+    assert h.versao_artefato(nome_arquivo) == versao
+
+
+def test_coletar_lixo_preserva_wheels_fixados_com_nome_do_hermes(tmp_path):
+    pasta = tmp_path / "requirements"
+    pasta.mkdir()
+    criar_wheelhouse(pasta, [
+        ("requests-2.31.0.whl", 1),
+        ("pywin32-ctypes-0.2.2.whl", 2),
+        ("tqdm-4.66.2.whl", 3),
+    ])
+    pinos = tmp_path / "requirements.txt"
+    pinos.write_text("requests==2.31.0\npywin32-ctypes==0.2.2\n", encoding="utf-8")
+
+    relatorio = h.coletar_lixo(pasta, 0, [pinos])
+
+    assert relatorio["fixados"] == ["pywin32-ctypes-0.2.2.whl", "requests-2.31.0.whl"]
+    assert [item["arquivo"] for item in relatorio["removidos"]] == ["tqdm-4.66.2.whl"]
+    assert (pasta / "requests-2.31.0.whl").exists()
+
+
+def test_localizar_artefatos_encontra_wheel_com_nome_do_hermes(tmp_path):
+    for nome in ("requests-2.31.0.whl", "requests-2.31.0.whl.part", "requests-2.31.1.whl", "pefile-2023.2.7.gz"):
+        (tmp_path / nome).write_bytes(b"x")
+    assert [arquivo.name for arquivo in h.localizar_artefatos(tmp_path, "requests==2.31.0")] == ["requests-2.31.0.whl"]
+    assert [arquivo.name for arquivo in h.localizar_artefatos(tmp_path, "Pefile==2023.2.7")] == ["pefile-2023.2.7.gz"]
+    assert h.localizar_artefatos(tmp_path, "requests") == []
+
+
+def test_baixar_pacote_offline_usa_wheel_local(tmp_path, monkeypatch):
+    monkeypatch.setattr(h, "disjuntor", h.DisjuntorRede())
+    h.disjuntor.offline = True
+    (tmp_path / "requests-2.31.0.whl").write_bytes(b"x")
+    assert h.baixar_pacote("requests==2.31.0", tmp_path) == tmp_path / "requests-2.31.0.whl"
+    assert not h.baixar_pacote("tqdm==4.66.2", tmp_path)
+
+
+def test_disjuntor_abre_e_fecha_por_host(monkeypatch):
+    relogio = [100.0]
+    monkeypatch.setattr(h.time, "monotonic", lambda: relogio[0])
+    disjuntor = h.DisjuntorRede(tempo_aberto=60)
+    disjuntor.offline = False
+
+    disjuntor.registrar_falha("https://pypi.org/pypi/requests/json", OSError("timeout"))
+    assert not disjuntor.disponivel("pypi.org")
+    assert disjuntor.disponivel("files.pythonhosted.org")
+    with pytest.raises(h.ErroRedeIndisponivel):
+        disjuntor.verificar("https://pypi.org/simple/")
+
+    relogio[0] += 61
+    assert disjuntor.disponivel("pypi.org")
+    disjuntor.registrar_falha("https://pypi.org/", OSError("timeout"))
+    disjuntor.registrar_sucesso("https://pypi.org/")
+    assert disjuntor.disponivel("pypi.org")
+
+
+def test_disjuntor_offline_bloqueia_tudo():
+    disjuntor = h.DisjuntorRede()
+    disjuntor.offline = True
+    assert not disjuntor.disponivel("pypi.org")
+    with pytest.raises(h.ErroRedeIndisponivel):
+        disjuntor.verificar("http://127.0.0.1:8080/simple/")
+
+
+def test_sessao_nao_repete_timeout_de_leitura(monkeypatch):
+    # Servidor que aceita a conexão e nunca responde
+    servidor = socket.socket()
+    servidor.bind(("127.0.0.1", 0))
+    servidor.listen(8)
+    conexoes = []
+    aceitar = threading.Thread(target=lambda: [conexoes.append(servidor.accept()) for _ in range(4)], daemon=True)
+    aceitar.start()
+    monkeypatch.setattr(h, "disjuntor", h.DisjuntorRede())
+    h.disjuntor.offline = False
+    sessao = h.criar_sessao_requests()
+    sessao.trust_env = False
+    url = f"http://127.0.0.1:{servidor.getsockname()[1]}/pypi/x/json"
+    try:
+        inicio = time.perf_counter()
+        with pytest.raises(h.requests.exceptions.ConnectionError):
+            sessao.get(url, timeout=(1, 0.3))
+        assert time.perf_counter() - inicio < 1
+        assert len(conexoes) == 1
+        assert not h.disjuntor.disponivel("127.0.0.1")
+        # Com o disjuntor aberto, a próxima requisição falha sem tocar a rede
+        with pytest.raises(h.ErroRedeIndisponivel):
+            sessao.get(url, timeout=(1, 0.3))
+        assert len(conexoes) == 1
+    finally:
+        servidor.close()
+
+
+def test_ordenar_grafo_dependencias_primeiro():
+    ordem = h.ordenar_grafo({"app": {"lib", "util"}, "lib": {"util"}, "util": set()})
+    assert ordem == ["util", "lib", "app"]
+
+
+def test_ordenar_grafo_quebra_ciclo_no_proprio_ciclo():
+    # 'app' depende do ciclo lib <-> base, mas não faz parte dele
+    ordem = h.ordenar_grafo({"app": {"lib"}, "lib": {"base"}, "base": {"lib"}})
+    assert sorted(ordem) == ["app", "base", "lib"]
+    assert ordem[-1] == "app"
+
+
+def test_ordenar_grafo_ignora_dependencias_fora_do_grafo():
+    assert h.ordenar_grafo({"a": {"b", "externo"}, "b": set()}) == ["b", "a"]
+
+
+class RespostaFalsa:
+    """Resposta de requests com stream=True servida a partir de bytes em memória."""
+
+    def __init__(self, dados, headers=None, bruto=None):
+        self.raw = bruto or io.BytesIO(dados)
+        self.headers = headers if headers is not None else {"content-length": str(len(dados))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+
+def criar_wheel(pasta, nome_arquivo, requires_dist=(), metadata=True):
+    """Cria um wheel mínimo com METADATA (Requires-Dist) e RECORD."""
+    projeto, versao = h.dividir_nome_artefato(nome_arquivo)
+    dist_info = f"{projeto.replace('-', '_')}-{versao}.dist-info"
+    caminho = pasta / nome_arquivo
+    with zipfile.ZipFile(caminho, "w") as wheel:
+        wheel.writestr(f"{projeto}/__init__.py", "")
+        if metadata:
+            wheel.writestr(f"{dist_info}/METADATA", "Metadata-Version: 2.1\n"
+                           f"Name: {projeto}\nVersion: {versao}\n"
+                           + "".join(f"Requires-Dist: {req}\n" for req in requires_dist) + "\nDescrição longa\n")
+        wheel.writestr(f"{dist_info}/RECORD", "")
+    return caminho
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(h, "disjuntor", h.DisjuntorRede())
+    h.disjuntor.offline = True
+
+
+def test_montar_grafo_expande_dependencias_transitivas(tmp_path, offline):
+    criar_wheel(tmp_path, "app-1.0-py3-none-any.whl", ["lib>=2", 'extra-only; extra == "teste"'])
+    criar_wheel(tmp_path, "lib-1.5-py3-none-any.whl")
+    criar_wheel(tmp_path, "lib-2.1-py3-none-any.whl", ["base<3", "fantasma>=1"])
+    criar_wheel(tmp_path, "lib-3.0rc1-py3-none-any.whl")
+    criar_wheel(tmp_path, "base-2.0.whl", ["lib"])
+
+    grafo, pacotes, nao_resolvidos = h.montar_grafo_dependencias(["app==1.0"], 2, tmp_path)
+
+    assert pacotes == {"app": "app==1.0", "lib": "lib==2.1", "base": "base==2.0"}
+    assert grafo == {"app": {"lib"}, "lib": {"base"}, "base": {"lib"}}
+    assert nao_resolvidos == [{"requisito": "fantasma>=1", "requerido_por": "lib==2.1"}]
+    assert h.ordenar_grafo(grafo)[-1] == "app"
+
+
+def test_baixar_pacote_usa_nome_do_indice(tmp_path, monkeypatch):
+    monkeypatch.setattr(h, "disjuntor", h.DisjuntorRede())
+    h.disjuntor.offline = False
+    conteudo = criar_wheel(tmp_path, "requests-2.31.0-py3-none-any.whl").read_bytes()
+    (tmp_path / "requests-2.31.0-py3-none-any.whl").unlink()
+    url = "https://files.pythonhosted.org/packages/py3/r/requests/requests-2.31.0-py3-none-any.whl"
+    monkeypatch.setattr(h, "obter_url_pacote", lambda nome, versao: (url, ".whl"))
+
+    class Sessao:
+        def get(self, url, **kwargs):
+            return RespostaFalsa(conteudo)
+
+    monkeypatch.setattr(h, "criar_sessao_requests", Sessao)
+
+    arquivo = h.baixar_pacote("requests==2.31.0", tmp_path)
+
+    assert arquivo == tmp_path / "requests-2.31.0-py3-none-any.whl"
+    assert arquivo.read_bytes() == conteudo
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_executor_verifica_o_arquivo_retornado(tmp_path, monkeypatch, offline):
+    criar_wheel(tmp_path, "requests-2.31.0.whl")
+    (tmp_path / "tqdm-4.66.2.whl").write_bytes(b"")
+    executor = h.ExecutorPipeline(["requests==2.31.0", "tqdm==4.66.2"], tmp_path)
+    assert executor._baixar("requests")
+    assert not executor._baixar("tqdm")
+
+
+
+def test_ler_requires_dist_wheel(tmp_path):
+    wheel = criar_wheel(tmp_path, "app-1.0-py3-none-any.whl", ["idna>=2.5", 'pysocks; extra == "socks"'])
+    assert h.ler_requires_dist_wheel(wheel) == ["idna>=2.5", 'pysocks; extra == "socks"']
+    sem_metadata = criar_wheel(tmp_path, "vazio-1.0-py3-none-any.whl", metadata=False)
+    with pytest.raises(ValueError):
+        h.ler_requires_dist_wheel(sem_metadata)
+
+
+def test_dependencias_locais_sem_hash_e_gravadas_uma_vez(tmp_path, monkeypatch, offline):
+    criar_wheel(tmp_path, "requests-2.31.0.whl", ["idna<4,>=2.5", "certifi>=2017.4.17"])
+    criar_wheel(tmp_path, "idna-3.6.whl")
+    criar_wheel(tmp_path, "certifi-2024.2.2-py3-none-any.whl")
+    h.atualizar_manifesto(tmp_path)
+
+    def sem_hash(arquivo):
+        raise AssertionError(f"sha256 calculado para {arquivo.name}")
+
+    gravacoes = []
+    salvar = h.salvar_manifesto
+    monkeypatch.setattr(h, "calcular_sha256", sem_hash)
+    monkeypatch.setattr(h, "salvar_manifesto", lambda pasta, manifesto: (gravacoes.append(1), salvar(pasta, manifesto)))
+
+    assert h.obter_dependencias_locais(tmp_path, "requests", "2.31.0") == ["idna<4,>=2.5", "certifi>=2017.4.17"]
+    assert gravacoes == []
+    grafo, pacotes, nao_resolvidos = h.montar_grafo_dependencias(["requests==2.31.0", "idna==3.6", "certifi==2024.2.2"], 2, tmp_path)
+    assert grafo["requests"] == {"idna", "certifi"}
+    assert nao_resolvidos == []
+    assert len(gravacoes) == 1
+    entradas = h.carregar_manifesto(tmp_path)["arquivos"]
+    assert entradas["requests-2.31.0.whl"]["requires_dist"] == ["idna<4,>=2.5", "certifi>=2017.4.17"]
+
+
+def test_verificar_wheelhouse_com_wheels_do_hermes(tmp_path):
+    pasta = tmp_path / "requirements"
+    pasta.mkdir()
+    criar_wheel(pasta, "requests-2.31.0.whl", ["idna<4,>=2.5", "urllib3<3,>=1.21.1"])
+    criar_wheel(pasta, "idna-3.6.whl")
+    (pasta / "pefile-2023.2.7.gz").write_bytes(b"x")
+    pinos = tmp_path / "requirements.txt"
+    pinos.write_text("requests==2.31.0\nidna==3.6\npefile==2023.2.7\n", encoding="utf-8")
+
+    relatorio = h.verificar_wheelhouse(pasta, [pinos])
+
+    assert relatorio["faltantes"] == [{"requisito": "urllib3<3,>=1.21.1", "requerido_por": "requests==2.31.0"}]
+    assert relatorio["conflitos"] == []
+    assert relatorio["sem_metadados"] == ["pefile-2023.2.7.gz"]
+    assert relatorio["ordem_instalacao"].index("idna-3.6.whl") < relatorio["ordem_instalacao"].index("requests-2.31.0.whl")
+
+
+def _registrar_em_outro_processo(pasta, processo, quantidade):
+    """Executado em processos separados: registra um artefato novo por iteração."""
+    pasta = h.Path(pasta)
+    erros = 0
+    for i in range(quantidade):
+        arquivo = pasta / f"p{processo}-{i}.0.tar.gz"
+        try:
+            h.registrar_uso(pasta, [arquivo])
+        except OSError:
+            erros += 1
+    return erros
+
+
+def test_manifesto_gravado_por_varios_processos(tmp_path):
+    processos, quantidade = 3, 15
+    for processo in range(processos):
+        for i in range(quantidade):
+            (tmp_path / f"p{processo}-{i}.0.tar.gz").write_bytes(b"x")
+
+    with multiprocessing.get_context("spawn").Pool(processos) as pool:
+        erros = pool.starmap(_registrar_em_outro_processo, [(str(tmp_path), processo, quantidade) for processo in range(processos)])
+
+    assert erros == [0] * processos
+    assert len(h.carregar_manifesto(tmp_path)["arquivos"]) == processos * quantidade
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+
+def test_indice_recarrega_arquivos_adicionados(tmp_path, monkeypatch):
+    monkeypatch.setattr(h, "RECARGA_INTERVALO", 0)
+    (tmp_path / "pefile-2023.2.7.gz").write_bytes(b"x")
+    indice = h.IndiceWheelhouse(tmp_path)
+    assert indice.projetos() == ["pefile"]
+    assert b"requests" not in indice.pagina_projetos(h.TIPO_SIMPLE_HTML)
+
+    # Copiado para a pasta enquanto o serve está rodando
+    criar_wheel(tmp_path, "requests-2.31.0-py3-none-any.whl")
+    assert indice.projetos() == ["pefile", "requests"]
+    assert b"requests" in indice.pagina_projetos(h.TIPO_SIMPLE_HTML)
+    assert indice.pagina_projeto("requests", h.TIPO_SIMPLE_JSON) is not None
+
+    (tmp_path / "pefile-2023.2.7.gz").unlink()
+    assert indice.pagina_projeto("pefile", h.TIPO_SIMPLE_JSON) is None
+
+
+def test_formatador_json_inclui_traceback_apos_a_fila():
+    fila = queue.SimpleQueue()
+    logger = logging.getLogger("hermes_teste_fila")
+    logger.propagate = False
+    handler = h.FilaLogHandler(fila)
+    logger.addHandler(handler)
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.error("falha em %s", "requests", exc_info=True, extra={"pacote": "requests", "fase": "download"})
+    finally:
+        logger.removeHandler(handler)
+
+    registro = json.loads(h.FormatadorJson().format(fila.get_nowait()))
+    assert registro["msg"] == "falha em requests"
+    assert registro["pacote"] == "requests"
+    assert registro["fase"] == "download"
+    assert "ZeroDivisionError" in registro["exc"]
+
+
+def _ler_linhas_log(arquivo):
+    linhas = []
+    for caminho in sorted(arquivo.parent.glob(arquivo.name + "*")):
+        if caminho.name.endswith(".gz"):
+            with gzip.open(caminho, "rt", encoding="utf-8") as f:
+                linhas.extend(f.read().splitlines())
+        elif caminho.suffix != ".lock":
+            linhas.extend(caminho.read_text(encoding="utf-8").splitlines())
+    return linhas
+
+
+def _gravar_log_em_outro_processo(arquivo, processo, quantidade):
+    """Executado em processos separados: grava registros no mesmo arquivo de log."""
+    handler = h.RotatingGzipHandler(h.Path(arquivo), maxBytes=2000, backupCount=100)
+    handler.setFormatter(h.FormatadorJson())
+    for i in range(quantidade):
+        handler.handle(logging.makeLogRecord({"msg": f"p{processo} {i}", "levelname": "INFO", "pacote": f"p{processo}"}))
+    handler.close()
+
+
+def test_log_compartilhado_entre_processos(tmp_path):
+    arquivo = tmp_path / "hermes_installer.jsonl"
+    processos, quantidade = 3, 60
+
+    with multiprocessing.get_context("spawn").Pool(processos) as pool:
+        pool.starmap(_gravar_log_em_outro_processo, [(str(arquivo), processo, quantidade) for processo in range(processos)])
+
+    mensagens = {json.loads(linha)["msg"] for linha in _ler_linhas_log(arquivo)}
+    assert mensagens == {f"p{processo} {i}" for processo in range(processos) for i in range(quantidade)}
+    assert list(tmp_path.glob("*.gz"))
+
+
+def test_log_mantem_apenas_os_backups_configurados(tmp_path):
+    arquivo = tmp_path / "hermes_installer.jsonl"
+    handler = h.RotatingGzipHandler(arquivo, maxBytes=500, backupCount=2)
+    handler.setFormatter(h.FormatadorJson())
+    for i in range(100):
+        handler.handle(logging.makeLogRecord({"msg": f"registro {i}", "levelname": "DEBUG"}))
+    handler.close()
+
+    assert sorted(caminho.name for caminho in tmp_path.iterdir()) == [
+        "hermes_installer.jsonl",
+        "hermes_installer.jsonl.1.gz",
+        "hermes_installer.jsonl.2.gz",
+        "hermes_installer.jsonl.lock",
+    ]
+    assert arquivo.stat().st_size <= 500
+    assert json.loads(arquivo.read_text(encoding="utf-8").splitlines()[-1])["msg"] == "registro 99"
+
+
+
+def _hash_record(conteudo):
+    return "sha256=" + base64.urlsafe_b64encode(hashlib.sha256(conteudo).digest()).rstrip(b"=").decode("ascii")
+
+
+def criar_wheel_com_record(caminho, membros, record):
+    """Cria um wheel com os membros informados e o RECORD dado (lista de linhas)."""
+    with zipfile.ZipFile(caminho, "w") as wheel:
+        for nome, conteudo in membros.items():
+            wheel.writestr(nome, conteudo)
+        wheel.writestr("foo-1.0.dist-info/RECORD", "\n".join(record) + "\n")
+    return caminho
+
+
+def test_verificar_record_wheel_integro(tmp_path):
+    conteudo = b"print('ola')\n"
+    wheel = criar_wheel_com_record(tmp_path / "foo-1.0-py3-none-any.whl", {"foo/__init__.py": conteudo}, [
+        f"foo/__init__.py,{_hash_record(conteudo)},{len(conteudo)}",
+        "foo-1.0.dist-info/RECORD,,",
+    ])
+    assert h.verificar_record_wheel(wheel, profundo=True) == []
+
+
+def test_verificar_record_wheel_aponta_cada_problema(tmp_path):
+    membros = {"foo/a.py": b"a = 1\n", "foo/b.py": b"b = 2\n", "foo/c.py": b"c = 3\n", "foo/extra.py": b""}
+    wheel = criar_wheel_com_record(tmp_path / "foo-1.0-py3-none-any.whl", membros, [
+        f"foo/a.py,{_hash_record(b'outro')},6",
+        "foo/b.py,md5-semigual,6",
+        "foo/c.py,,99",
+        "foo/sumido.py,,",
+        "foo-1.0.dist-info/RECORD,,",
+    ])
+
+    rasos = h.verificar_record_wheel(wheel)
+    assert sorted(rasos) == [
+        "foo/c.py: tamanho 6 difere do RECORD (99)",
+        "foo/extra.py: presente no zip mas fora do RECORD",
+        "foo/sumido.py: listado no RECORD mas ausente do zip",
+    ]
+
+    profundos = h.verificar_record_wheel(wheel, profundo=True)
+    assert "foo/a.py: hash difere do RECORD" in profundos
+    assert any(problema.startswith("foo/b.py: hash inválido no RECORD") for problema in profundos)
+    assert len(profundos) == len(rasos) + 2
+
+
+def test_verificar_record_wheel_zip_invalido(tmp_path):
+    wheel = tmp_path / "foo-1.0-py3-none-any.whl"
+    wheel.write_bytes(b"nao e um zip")
+    assert [problema.split(":")[0] for problema in h.verificar_record_wheel(wheel)] == ["zip inválido"]
+
+
+def test_auditar_wheelhouse(tmp_path):
+    pasta = tmp_path / "requirements"
+    pasta.mkdir()
+    conteudo = b"x = 1\n"
+    criar_wheel_com_record(pasta / "foo-1.0-py3-none-any.whl", {"foo/__init__.py": conteudo}, [
+        f"foo/__init__.py,{_hash_record(conteudo)},{len(conteudo)}",
+        "foo-1.0.dist-info/RECORD,,",
+    ])
+    (pasta / "bar-2.0.tar.gz").write_bytes(b"sdist")
+    h.atualizar_manifesto(pasta)
+
+    relatorio = h.auditar_wheelhouse(pasta, profundo=True)
+    assert relatorio["integro"]
+    assert relatorio["resumo"] == {"ok": 2}
+
+    (pasta / "bar-2.0.tar.gz").write_bytes(b"alterado")
+    (pasta / "leia-me.txt").write_text("?", encoding="utf-8")
+    (pasta / "baz-1.0-py3-none-any.whl.part").write_bytes(b"")
+    relatorio = h.auditar_wheelhouse(pasta)
+    status = {resultado["arquivo"]: resultado["status"] for resultado in relatorio["arquivos"]}
+    assert status == {
+        "bar-2.0.tar.gz": "hash_divergente",
+        "foo-1.0-py3-none-any.whl": "ok",
+        "leia-me.txt": "nao_reconhecido",
+    }
+    assert not relatorio["integro"]
+
+
+def test_tags_wheel_expande_conjuntos_compactados():
+    assert h.tags_wheel("foo-1.0-py2.py3-none-any.whl") == {"py2-none-any", "py3-none-any"}
+    assert h.tags_wheel("foo-1.0-cp311-cp311-manylinux_2_17_x86_64.manylinux2014_x86_64.whl") == {
+        "cp311-cp311-manylinux_2_17_x86_64",
+        "cp311-cp311-manylinux2014_x86_64",
+    }
+    assert h.tags_wheel("invalido.whl") == set()
+
+
+def test_escolher_artefato():
+    prioridade = {"cp311-cp311-manylinux2014_x86_64": 0, "cp311-abi3-manylinux2014_x86_64": 1, "py3-none-any": 2}
+    nativo = Path("foo-1.0-cp311-cp311-manylinux2014_x86_64.whl")
+    universal = Path("foo-1.0-py3-none-any.whl")
+    windows = Path("foo-1.0-cp311-cp311-win_amd64.whl")
+    sdist = Path("foo-1.0.tar.gz")
+    assert h.escolher_artefato([universal, nativo, sdist], prioridade) == nativo
+    assert h.escolher_artefato([windows, universal], prioridade) == universal
+    assert h.escolher_artefato([windows, sdist], prioridade) == sdist
+    assert h.escolher_artefato([windows], prioridade) is None
+
+
+def test_gravar_stream_grava_todos_os_bytes(tmp_path):
+    dados = os.urandom(3 * h.BUFFER_MINIMO + 123)
+    hasher = hashlib.sha256()
+    destino = tmp_path / "foo.whl.part"
+
+    escritos = h.gravar_stream(RespostaFalsa(dados), destino, hasher=hasher, mostrar_progresso=False)
+
+    assert escritos == len(dados)
+    assert destino.read_bytes() == dados
+    assert hasher.hexdigest() == hashlib.sha256(dados).hexdigest()
+
+
+def test_gravar_stream_ignora_content_length_comprimido(tmp_path):
+    resposta = RespostaFalsa(b"descomprimido", headers={"content-length": "5", "content-encoding": "gzip"})
+    assert h.gravar_stream(resposta, tmp_path / "foo.part", mostrar_progresso=False) == len(b"descomprimido")
+
+
+def test_gravar_stream_leitura_incompleta(tmp_path):
+    resposta = RespostaFalsa(b"x" * 10, headers={"content-length": "100"})
+    with pytest.raises(h.requests.exceptions.ConnectionError, match="10 de 100"):
+        h.gravar_stream(resposta, tmp_path / "foo.part", mostrar_progresso=False)
+
+
+def test_gravar_stream_erro_do_urllib3_vira_erro_de_conexao(tmp_path):
+    class Interrompido(io.BytesIO):
+        def readinto(self, buffer):
+            raise h.Urllib3HTTPError("conexão encerrada")
+
+    resposta = RespostaFalsa(b"", headers={}, bruto=Interrompido())
+    with pytest.raises(h.requests.exceptions.ConnectionError):
+        h.gravar_stream(resposta, tmp_path / "foo.part", mostrar_progresso=False)
+
+
+def test_baixar_pacote_remove_parcial_em_falha(tmp_path, monkeypatch):
+    monkeypatch.setattr(h, "disjuntor", h.DisjuntorRede())
+    h.disjuntor.offline = False
+    url = "https://files.pythonhosted.org/packages/py3/r/requests/requests-2.31.0-py3-none-any.whl"
+    monkeypatch.setattr(h, "obter_url_pacote", lambda nome, versao: (url, ".whl"))
+
+    class Sessao:
+        def get(self, url, **kwargs):
+            return RespostaFalsa(b"x" * 10, headers={"content-length": "1000"})
+
+    monkeypatch.setattr(h, "criar_sessao_requests", Sessao)
+
+    assert h.baixar_pacote("requests==2.31.0", tmp_path) is None
+    assert list(tmp_path.iterdir()) == []